@@ -0,0 +1,77 @@
+import random
+from itertools import cycle
+from typing import Dict, List
+
+from django.db.models import Max, Min
+from django.test import Client
+
+from benchmarks.runner import measure
+from benchmarks.seed import schedule_data
+from schedules.models import Schedule
+
+SCHEDULES_URL = '/api/schedules/'
+
+
+def check(response):
+    if response.status_code >= 300:
+        raise RuntimeError(
+            f"{response.request['REQUEST_METHOD']} "
+            f"{response.request['PATH_INFO']} returned "
+            f"{response.status_code}: {response.content[:200]!r}"
+        )
+    return response
+
+
+def sample_ids(rng: random.Random, count: int) -> List[int]:
+    """
+    ids of up to count existing schedules, without scanning the table
+    """
+    bounds = Schedule.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    population = range(bounds['low'], bounds['high'] + 1)
+    candidates = rng.sample(population, min(count, len(population)))
+    return list(
+        Schedule.objects.filter(pk__in=candidates).values_list('pk', flat=True)
+    )
+
+
+def api_benchmarks(
+    repeat: int, fanout: int, rng: random.Random, seed: int = 0
+) -> Dict[str, Dict]:
+    """
+    latency and query counts of the list, detail, create and update views
+    """
+    client = Client()
+    ids = cycle(sample_ids(rng, repeat))
+    new_numbers = iter(range(10 ** 9, 10 ** 9 + repeat))
+    recipient_pool = max(fanout, Schedule.objects.count() // 10)
+
+    def create():
+        data = schedule_data(
+            next(new_numbers), rng, fanout, recipient_pool, seed
+        )
+        check(client.post(
+            SCHEDULES_URL, data, content_type='application/json'
+        ))
+
+    def update():
+        pk = next(ids)
+        data = schedule_data(
+            pk + 2 * 10 ** 9, rng, fanout, recipient_pool, seed
+        )
+        check(client.put(
+            f'{SCHEDULES_URL}{pk}/', data, content_type='application/json'
+        ))
+
+    return {
+        'list': measure(lambda: check(client.get(
+            SCHEDULES_URL, {'page_size': 100}
+        )), repeat),
+        'detail': measure(
+            lambda: check(client.get(f'{SCHEDULES_URL}{next(ids)}/')),
+            repeat
+        ),
+        'create': measure(create, repeat),
+        'update': measure(update, repeat),
+    }
@@ -0,0 +1,105 @@
+import time
+from datetime import timedelta
+from typing import Dict, List
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core import mail
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from benchmarks.runner import summarize
+from schedules.models import Schedule
+from schedules.tasks import task_send_email, send_email_to_schedule
+from utils import metrics
+from utils.mail import connection_pool, DELIVERY_ENGINE_POOL,\
+    DELIVERY_ENGINE_ASYNCIO
+from utils.testing import SMTPSink
+
+LOCMEM_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+def tick_benchmark(repeat: int) -> Dict:
+    """
+    time task_send_email ticks that each find a full batch of due
+    schedules among the rest of the table. The per schedule send tasks are
+    not enqueued, so this measures the dispatcher alone.
+    """
+    now = timezone.now()
+    Schedule.objects.update(
+        status=Schedule.ACTIVE, next_run_at=now + timedelta(days=1)
+    )
+    due_ids = list(Schedule.objects.values_list('pk', flat=True)[
+        :settings.SCHEDULES_DISPATCH_BATCH_SIZE
+    ])
+    timings, dispatched = [], metrics.DISPATCHED._default.value
+    with patch.object(send_email_to_schedule, 'delay'):
+        for _ in range(repeat):
+            Schedule.objects.filter(pk__in=due_ids).update(
+                next_run_at=now - timedelta(minutes=1)
+            )
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                task_send_email()
+                timings.append(time.perf_counter() - start)
+    dispatched = metrics.DISPATCHED._default.value - dispatched
+    return dict(
+        summarize(timings), queries=len(queries), repeat=repeat,
+        dispatched_per_tick=dispatched / repeat
+    )
+
+
+def send_rate(schedule_ids: List[int], **email_settings) -> Dict:
+    """
+    send every schedule once with the given email settings and return the
+    emails sent per second
+    """
+    with override_settings(**email_settings):
+        connection_pool().close()
+        try:
+            start = time.perf_counter()
+            emails = sum(
+                send_email_to_schedule(pk)['sent'] for pk in schedule_ids
+            )
+            elapsed = time.perf_counter() - start
+        finally:
+            connection_pool().close()
+    return {
+        'schedules': len(schedule_ids),
+        'emails': emails,
+        'seconds': round(elapsed, 3),
+        'emails_per_second': round(emails / elapsed, 1),
+    }
+
+
+def send_benchmarks(schedule_ids: List[int], smtp_delay: float) -> Dict:
+    """
+    end to end sends per second against the locmem backend and, with each
+    delivery engine, a local SMTP sink acknowledging every message after
+    smtp_delay seconds
+    """
+    results = {
+        'locmem': send_rate(
+            schedule_ids, EMAIL_BACKEND=LOCMEM_BACKEND,
+            EMAIL_DELIVERY_ENGINE=DELIVERY_ENGINE_POOL
+        )
+    }
+    mail.outbox = []
+    with SMTPSink(delay=smtp_delay) as sink:
+        smtp_settings = {
+            'EMAIL_BACKEND': SMTP_BACKEND,
+            'EMAIL_HOST': '127.0.0.1',
+            'EMAIL_PORT': sink.port,
+            'EMAIL_USE_TLS': False,
+            'EMAIL_HOST_USER': '',
+            'EMAIL_HOST_PASSWORD': '',
+        }
+        for engine in (DELIVERY_ENGINE_POOL, DELIVERY_ENGINE_ASYNCIO):
+            results[f'smtp_{engine}'] = send_rate(
+                schedule_ids, EMAIL_DELIVERY_ENGINE=engine, **smtp_settings
+            )
+            sink.messages.clear()
+    return results
@@ -0,0 +1,47 @@
+import platform
+import statistics
+import time
+from typing import Callable, Dict, List
+
+import django
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    """
+    latency summary in milliseconds
+    """
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return {
+        'min_ms': round(timings[0] * 1000, 3),
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'p95_ms': round(p95 * 1000, 3),
+        'max_ms': round(timings[-1] * 1000, 3),
+    }
+
+
+def measure(function: Callable, repeat: int) -> Dict:
+    """
+    call function repeat times, returning its latency summary and the
+    number of queries of the last call
+    """
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+    return dict(summarize(timings), queries=len(queries), repeat=repeat)
+
+
+def environment() -> Dict:
+    return {
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+    }
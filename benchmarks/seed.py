@@ -0,0 +1,49 @@
+import random
+from datetime import timedelta
+from typing import Dict
+
+from schedules.models import Schedule
+from utils.models import default_date_time
+from utils.seeding import FREQUENCIES, recipient_address, seed_schedules
+from utils.testing import create_schedule_input_data
+
+
+def schedule_data(
+    number: int, rng: random.Random, fanout: int, recipient_pool: int,
+    seed: int = 0
+) -> Dict:
+    """
+    request payload of a new schedule sent to recipients of the seeded
+    pool, built with the utils.testing factories
+    """
+    start_date = default_date_time(minutes=rng.randrange(2 * 24 * 60))
+    return create_schedule_input_data(
+        description=f'benchmark schedule {number}',
+        subject=f'subject {number % 100}',
+        content=f'content {number}',
+        frequency=rng.choice(FREQUENCIES),
+        start_date=start_date,
+        end_date=start_date + timedelta(days=30),
+        recipients=[
+            {
+                'name': f'recipient {recipient}',
+                'email_address': recipient_address(seed, recipient)
+            }
+            for recipient in rng.sample(
+                range(recipient_pool), min(fanout, recipient_pool)
+            )
+        ]
+    )
+
+
+def seed_to_size(size: int, fanout: int = 5, seed: int = 0):
+    """
+    top the schedules table up to size rows, sharing a pool of recipients
+    a tenth the size of the table
+    """
+    existing = Schedule.objects.count()
+    if size > existing:
+        seed_schedules(
+            size - existing, recipients=max(fanout, size // 10),
+            fanout=fanout, seed=seed
+        )
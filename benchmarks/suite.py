@@ -0,0 +1,45 @@
+import random
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.api import api_benchmarks, sample_ids
+from benchmarks.dispatch import send_benchmarks, tick_benchmark
+from benchmarks.runner import environment
+from benchmarks.seed import seed_to_size
+
+
+def run_suite(
+    sizes: List[int], fanout: int = 5, repeat: int = 20, sends: int = 50,
+    smtp_delay: float = 0, seed: int = 0, log: Callable = None
+) -> Dict:
+    """
+    seed the database up to each size in turn and run every benchmark
+    against it. Expects an empty, throwaway database.
+    """
+    log = log or (lambda message: None)
+    results = {}
+    for size in sorted(sizes):
+        rng = random.Random(f'{seed}:{size}')
+        log(f"seeding {size} schedules")
+        start = time.perf_counter()
+        seed_to_size(size, fanout=fanout, seed=seed)
+        result = {'seed_seconds': round(time.perf_counter() - start, 3)}
+
+        log(f"{size} schedules: api")
+        result.update(api_benchmarks(repeat, fanout, rng, seed))
+        log(f"{size} schedules: dispatcher tick")
+        result['tick'] = tick_benchmark(repeat)
+        log(f"{size} schedules: sends")
+        result['sends'] = send_benchmarks(
+            sample_ids(rng, sends), smtp_delay
+        )
+        results[str(size)] = result
+
+    return {
+        'environment': environment(),
+        'options': {
+            'sizes': sorted(sizes), 'fanout': fanout, 'repeat': repeat,
+            'sends': sends, 'smtp_delay': smtp_delay, 'seed': seed,
+        },
+        'results': results,
+    }
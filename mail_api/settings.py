@@ -131,9 +131,64 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 
+# Schedules API settings
+SCHEDULES_PAGE_SIZE = int(os.getenv('SCHEDULES_PAGE_SIZE', 100))
+SCHEDULES_MAX_PAGE_SIZE = int(os.getenv('SCHEDULES_MAX_PAGE_SIZE', 1000))
+SCHEDULES_STREAM_CHUNK_SIZE = int(
+    os.getenv('SCHEDULES_STREAM_CHUNK_SIZE', 500)
+)
+SCHEDULES_BULK_MAX_ITEMS = int(os.getenv('SCHEDULES_BULK_MAX_ITEMS', 10000))
+SCHEDULES_DISPATCH_INTERVAL = float(
+    os.getenv('SCHEDULES_DISPATCH_INTERVAL', 60)
+)
+SCHEDULES_DISPATCH_BATCH_SIZE = int(
+    os.getenv('SCHEDULES_DISPATCH_BATCH_SIZE', 1000)
+)
+SCHEDULES_BEAT_POLL_INTERVAL = float(
+    os.getenv('SCHEDULES_BEAT_POLL_INTERVAL', 10)
+)
+SCHEDULES_ENGINE_ENABLED = os.getenv('SCHEDULES_ENGINE_ENABLED') == 'true'
+SCHEDULES_ENGINE_JITTER = float(os.getenv('SCHEDULES_ENGINE_JITTER', 0))
+SCHEDULES_ENGINE_RELOAD_INTERVAL = float(
+    os.getenv('SCHEDULES_ENGINE_RELOAD_INTERVAL', 300)
+)
+SCHEDULES_CACHE_TIMEOUT = int(os.getenv('SCHEDULES_CACHE_TIMEOUT', 300))
+
+
+# Cache
+# locmem by default; point CACHE_BACKEND and CACHE_LOCATION at a shared
+# cache such as Redis or memcached when running several processes, or
+# schedule invalidations only reach other processes once cached entries
+# expire after SCHEDULES_CACHE_TIMEOUT. check --deploy warns about locmem.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+
+# Metrics settings
+# Samples are kept per process. The web metrics of the process answering
+# a scrape are exposed at /metrics; when METRICS_STATSD_HOST is set every
+# sample is also sent to StatsD over UDP, which is the only supported path
+# for the metrics of Celery workers and for aggregating web workers
+METRICS_STATSD_HOST = os.getenv('METRICS_STATSD_HOST')
+METRICS_STATSD_PORT = int(os.getenv('METRICS_STATSD_PORT', 8125))
+METRICS_STATSD_PREFIX = os.getenv('METRICS_STATSD_PREFIX', 'mail_api')
+
+
 # Celery configuration settings
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL")
-CELERY_CELERYBEAT_SCHEDULE = {}
+CELERY_BEAT_SCHEDULER = 'schedules.beat:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'dispatch-due-schedules': {
+        'task': 'schedules.tasks.task_send_email',
+        'schedule': SCHEDULES_DISPATCH_INTERVAL,
+    },
+}
 
 
 # Email configuration settings
@@ -143,3 +198,23 @@ EMAIL_HOST = os.environ.get("EMAIL_HOST")
 EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD")
 EMAIL_PORT = os.environ.get("EMAIL_PORT")
+EMAIL_POOL_SIZE = int(os.getenv('EMAIL_POOL_SIZE', 2))
+EMAIL_POOL_IDLE_TIMEOUT = float(os.getenv('EMAIL_POOL_IDLE_TIMEOUT', 60))
+EMAIL_POOL_MAX_MESSAGES = int(os.getenv('EMAIL_POOL_MAX_MESSAGES', 100))
+EMAIL_POOL_HEALTH_CHECK_INTERVAL = float(
+    os.getenv('EMAIL_POOL_HEALTH_CHECK_INTERVAL', 30)
+)
+EMAIL_SEND_MODE = os.getenv('EMAIL_SEND_MODE', 'per_recipient')
+EMAIL_BCC_CHUNK_SIZE = int(os.getenv('EMAIL_BCC_CHUNK_SIZE', 50))
+EMAIL_DELIVERY_LEDGER_BATCH_SIZE = int(
+    os.getenv('EMAIL_DELIVERY_LEDGER_BATCH_SIZE', 50)
+)
+EMAIL_DELIVERY_CLAIM_TIMEOUT = float(
+    os.getenv('EMAIL_DELIVERY_CLAIM_TIMEOUT', 900)
+)
+EMAIL_CONTENT_CACHE_SIZE = int(os.getenv('EMAIL_CONTENT_CACHE_SIZE', 1024))
+EMAIL_DELIVERY_ENGINE = os.getenv('EMAIL_DELIVERY_ENGINE', 'pool')
+EMAIL_ASYNC_CONNECTIONS_PER_HOST = int(
+    os.getenv('EMAIL_ASYNC_CONNECTIONS_PER_HOST', 10)
+)
+EMAIL_ASYNC_QUEUE_SIZE = int(os.getenv('EMAIL_ASYNC_QUEUE_SIZE', 100))
@@ -15,9 +15,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from schedules.views import metrics
 # from schedules import urls as schedules_urls
 
 urlpatterns = [
     # path('admin/', admin.site.urls),
     path('api/schedules/', include('schedules.urls')),
+    path('metrics', metrics),
 ]
@@ -0,0 +1,91 @@
+import time
+
+from celery.beat import Scheduler
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Max
+
+from schedules.models import Interval
+
+INTERVAL_ENTRY_PREFIX = 'interval:'
+
+
+def interval_entry_name(interval: Interval) -> str:
+    return f'{INTERVAL_ENTRY_PREFIX}{interval.interval}'
+
+
+class DatabaseScheduler(Scheduler):
+    """
+    celery beat scheduler that runs task_send_email for every Interval row
+    in the database, alongside the static entries of CELERY_BEAT_SCHEDULE.
+
+    Every SCHEDULES_BEAT_POLL_INTERVAL seconds it reads a cheap change
+    marker (row count and latest id and date_added) and only reloads the
+    Interval rows when the marker moved. The heap of next fire times is
+    rebuilt only after a reload, so a tick without changes is a heap
+    operation rather than a comparison of the whole schedule.
+    """
+    def __init__(self, *args, **kwargs):
+        self.poll_interval = settings.SCHEDULES_BEAT_POLL_INTERVAL
+        self._marker = None
+        self._next_poll = 0
+        self._version = 0
+        self._heap_version = None
+        super().__init__(*args, **kwargs)
+
+    def setup_schedule(self):
+        self.install_default_entries(self.schedule)
+        self.merge_inplace(self.app.conf.beat_schedule)
+        self.poll()
+
+    def change_marker(self) -> tuple:
+        marker = Interval.objects.aggregate(
+            count=Count('id'), last_id=Max('id'), last_added=Max('date_added')
+        )
+        return marker['count'], marker['last_id'], marker['last_added']
+
+    def poll(self):
+        """
+        reload the Interval entries if the change marker moved since the
+        last poll. Does nothing until poll_interval has elapsed.
+        """
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + self.poll_interval
+
+        close_old_connections()
+        marker = self.change_marker()
+        if marker == self._marker:
+            return
+        self._marker = marker
+
+        intervals = {
+            interval_entry_name(interval): interval
+            for interval in Interval.objects.all()
+        }
+        for name in list(self.schedule):
+            if name.startswith(INTERVAL_ENTRY_PREFIX) and \
+                    name not in intervals:
+                del self.schedule[name]
+        for name, interval in intervals.items():
+            if name not in self.schedule:
+                self.schedule[name] = self.Entry(
+                    name=name,
+                    task='schedules.tasks.task_send_email',
+                    schedule=interval.interval,
+                    args=(interval.interval.total_seconds(),),
+                    app=self.app
+                )
+        self._version += 1
+
+    def populate_heap(self, *args, **kwargs):
+        super().populate_heap(*args, **kwargs)
+        self._heap_version = self._version
+
+    def schedules_equal(self, old_schedules, new_schedules):
+        return self._heap_version == self._version
+
+    def tick(self, *args, **kwargs):
+        self.poll()
+        return min(super().tick(*args, **kwargs), self.poll_interval)
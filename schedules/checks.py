@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+LOCMEM_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    warn when deploying with the per process locmem cache: invalidations
+    written by the Celery workers and other web workers never reach it,
+    so cached schedules and their ETags go stale until they expire
+    """
+    if settings.CACHES['default']['BACKEND'] != LOCMEM_CACHE_BACKEND:
+        return []
+    return [Warning(
+        "The default cache is a per process LocMemCache.",
+        hint="Set CACHE_BACKEND and CACHE_LOCATION to a cache shared by "
+             "every process, such as Redis or memcached.",
+        id='schedules.W001',
+    )]
@@ -0,0 +1,195 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+
+from schedules.models import Schedule, ScheduleTombstone, ChangeCounter
+from utils.changes import change_counter
+
+DISPATCHABLE_STATUSES = (Schedule.ACTIVE, Schedule.NOT_ADDED)
+
+
+class SchedulingEngine:
+    """
+    min-heap of the next fire time of every dispatchable schedule, so the
+    dispatcher only looks at schedules that are due instead of every
+    schedule sharing an interval.
+
+    The heap is rebuilt from the database by load() and kept up to date
+    incrementally with upsert() and remove(), and with the writes of other
+    processes by following the change_seq of schedules and tombstones.
+    Replaced entries are left in the heap and skipped when popped; the
+    heap is compacted once stale entries outnumber live ones.
+
+    Each schedule fires up to `jitter` seconds after its next_run_at. The
+    offset is derived from the schedule id, so it is stable across
+    processes and restarts while spreading schedules that share a start
+    time over the jitter window.
+    """
+    def __init__(self, jitter: float = None):
+        if jitter is None:
+            jitter = settings.SCHEDULES_ENGINE_JITTER
+        self.jitter = jitter
+        self.loaded = False
+        self._heap = []
+        self._fire_times = {}
+        self._change_seq = 0
+        self._loaded_at = 0
+        self._lock = threading.RLock()
+
+    def jitter_for(self, schedule_id: int) -> timedelta:
+        fraction = (schedule_id * 2654435761 % 2 ** 32) / 2 ** 32
+        return timedelta(seconds=self.jitter * fraction)
+
+    def load(self):
+        """
+        rebuild the heap from every dispatchable schedule in the database
+        """
+        # read before the rows, so that writes committed in between are
+        # applied again by the next refresh rather than missed
+        change_seq, _ = change_counter(ChangeCounter.SCHEDULES)
+        rows = Schedule.objects.filter(
+            status__in=DISPATCHABLE_STATUSES, next_run_at__isnull=False
+        ).values_list('id', 'next_run_at')
+        with self._lock:
+            self._fire_times = {
+                schedule_id: next_run_at + self.jitter_for(schedule_id)
+                for schedule_id, next_run_at in rows
+            }
+            self._rebuild_heap()
+            self._change_seq = change_seq
+            self._loaded_at = time.monotonic()
+            self.loaded = True
+
+    def refresh(self):
+        """
+        load the engine on first use and again every
+        SCHEDULES_ENGINE_RELOAD_INTERVAL seconds, applying the schedules
+        written or deleted by other processes in between
+        """
+        reload_after = self._loaded_at + \
+            settings.SCHEDULES_ENGINE_RELOAD_INTERVAL
+        if not self.loaded or time.monotonic() >= reload_after:
+            self.load()
+            return
+        self.apply_changes()
+
+    def apply_changes(self):
+        """
+        upsert the schedules and drop the tombstones whose change_seq is
+        past the last one applied. Both lookups are served by their
+        (change_seq, id) indexes.
+        """
+        rows = Schedule.objects.filter(
+            change_seq__gt=self._change_seq
+        ).values_list('id', 'next_run_at', 'status', 'change_seq')
+        tombstones = ScheduleTombstone.objects.filter(
+            change_seq__gt=self._change_seq
+        ).values_list('schedule_id', 'change_seq')
+        with self._lock:
+            change_seq = self._change_seq
+            # a schedule still in the table outlives any tombstone of its id
+            for schedule_id, row_seq in tombstones:
+                self.remove(schedule_id)
+                change_seq = max(change_seq, row_seq)
+            for schedule_id, next_run_at, status, row_seq in rows:
+                self.upsert(schedule_id, next_run_at, status)
+                change_seq = max(change_seq, row_seq)
+            self._change_seq = change_seq
+
+    def reload_ids(self, schedule_ids: Iterable[int]):
+        """
+        re-read the given schedules from the database and upsert them
+        """
+        schedule_ids = list(schedule_ids)
+        rows = {
+            schedule_id: (next_run_at, status)
+            for schedule_id, next_run_at, status in Schedule.objects.filter(
+                pk__in=schedule_ids
+            ).values_list('id', 'next_run_at', 'status')
+        }
+        with self._lock:
+            for schedule_id in schedule_ids:
+                next_run_at, status = rows.get(schedule_id, (None, None))
+                self.upsert(schedule_id, next_run_at, status)
+
+    def upsert(self, schedule_id: int, next_run_at: datetime, status: str):
+        with self._lock:
+            if next_run_at is None or status not in DISPATCHABLE_STATUSES:
+                self._fire_times.pop(schedule_id, None)
+                return
+            fire_at = next_run_at + self.jitter_for(schedule_id)
+            if self._fire_times.get(schedule_id) == fire_at:
+                return
+            self._fire_times[schedule_id] = fire_at
+            heapq.heappush(self._heap, (fire_at, schedule_id))
+            if len(self._heap) > 2 * len(self._fire_times) + 64:
+                self._rebuild_heap()
+
+    def remove(self, schedule_id: int):
+        with self._lock:
+            self._fire_times.pop(schedule_id, None)
+
+    def pop_due(self, now: datetime, limit: int = None) -> List[int]:
+        """
+        remove and return the ids of up to limit schedules whose fire time
+        has passed, earliest first
+        """
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and \
+                    (limit is None or len(due) < limit):
+                fire_at, schedule_id = heapq.heappop(self._heap)
+                if self._fire_times.get(schedule_id) == fire_at:
+                    del self._fire_times[schedule_id]
+                    due.append(schedule_id)
+        return due
+
+    def next_fire_time(self) -> Optional[datetime]:
+        with self._lock:
+            while self._heap:
+                fire_at, schedule_id = self._heap[0]
+                if self._fire_times.get(schedule_id) == fire_at:
+                    return fire_at
+                heapq.heappop(self._heap)
+        return None
+
+    def __len__(self):
+        return len(self._fire_times)
+
+    def _rebuild_heap(self):
+        self._heap = [
+            (fire_at, schedule_id)
+            for schedule_id, fire_at in self._fire_times.items()
+        ]
+        heapq.heapify(self._heap)
+
+
+_engine = None
+
+
+def scheduling_engine() -> SchedulingEngine:
+    """
+    the scheduling engine of the current process, created on first use
+    """
+    global _engine
+    if _engine is None:
+        _engine = SchedulingEngine()
+    return _engine
+
+
+def schedule_changed(schedule: Schedule):
+    """
+    keep this process' engine in step with a created or updated schedule.
+    Processes that never loaded the engine have nothing to update.
+    """
+    if _engine is not None and _engine.loaded:
+        _engine.upsert(schedule.pk, schedule.next_run_at, schedule.status)
+
+
+def schedule_deleted(schedule_id: int):
+    if _engine is not None and _engine.loaded:
+        _engine.remove(schedule_id)
@@ -0,0 +1,75 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment,\
+    teardown_test_environment
+
+from benchmarks.suite import run_suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the schedules API, the dispatcher and email delivery "
+        "against a throwaway test database seeded with each of --sizes "
+        "schedules, writing the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000],
+            help="numbers of schedules to seed, e.g. 1000 100000 1000000"
+        )
+        parser.add_argument(
+            '--fanout', type=int, default=5,
+            help="recipients per schedule"
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help="samples per latency benchmark"
+        )
+        parser.add_argument(
+            '--sends', type=int, default=50,
+            help="schedules sent per delivery benchmark"
+        )
+        parser.add_argument(
+            '--smtp-delay', type=float, default=0,
+            help="seconds the local SMTP sink waits before each reply"
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', help="write the results to this file, not stdout"
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help="keep the seeded test database for the next run"
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb']
+        )
+        try:
+            results = run_suite(
+                sizes=options['sizes'],
+                fanout=options['fanout'],
+                repeat=options['repeat'],
+                sends=options['sends'],
+                smtp_delay=options['smtp_delay'],
+                seed=options['seed'],
+                log=lambda message: self.stderr.write(message)
+            )
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from utils.seeding import seed_schedules, FANOUT_DISTRIBUTIONS,\
+    FANOUT_FIXED
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert synthetic schedules and shared recipients for load "
+        "testing, with batched INSERTs or PostgreSQL COPY. The same --seed "
+        "always produces the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('schedules', type=int)
+        parser.add_argument(
+            '--recipients', type=int, default=None,
+            help="size of the shared recipient pool, a tenth of the "
+                 "schedules by default"
+        )
+        parser.add_argument(
+            '--fanout', type=int, default=5,
+            help="recipients per schedule, or the minimum of the "
+                 "distribution"
+        )
+        parser.add_argument(
+            '--fanout-max', type=int, default=None,
+            help="largest fan-out of the uniform and pareto distributions, "
+                 "ten times --fanout by default"
+        )
+        parser.add_argument(
+            '--distribution', choices=FANOUT_DISTRIBUTIONS,
+            default=FANOUT_FIXED
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument(
+            '--no-copy', action='store_false', dest='use_copy',
+            default=None, help="use batched INSERTs even on PostgreSQL"
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        seeded = seed_schedules(
+            count=options['schedules'],
+            recipients=options['recipients'] or options['schedules'] // 10,
+            fanout=options['fanout'],
+            fanout_max=options['fanout_max'],
+            distribution=options['distribution'],
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            use_copy=options['use_copy']
+        )
+        self.stdout.write(
+            "seeded {schedules} schedules, {recipients} recipients and "
+            "{memberships} memberships".format(**seeded) +
+            f" in {time.perf_counter() - start:.1f}s"
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.2 on 2026-10-18 07:00
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_next_run_at(apps, schema_editor):
+    Schedule = apps.get_model('schedules', 'Schedule')
+    Schedule.objects.filter(next_run_at__isnull=True).update(
+        next_run_at=F('start_date')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0018_auto_20201117_1329'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='next_run_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(
+            backfill_next_run_at, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['status', 'next_run_at'], name='schedule_status_next_run_idx'),
+        ),
+    ]
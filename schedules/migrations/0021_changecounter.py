@@ -0,0 +1,30 @@
+# Generated by Django 3.1.2 on 2026-10-18 07:26
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def create_schedules_counter(apps, schema_editor):
+    ChangeCounter = apps.get_model('schedules', 'ChangeCounter')
+    ChangeCounter.objects.get_or_create(name='schedules')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0020_delivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(
+            create_schedules_counter, migrations.RunPython.noop
+        ),
+    ]
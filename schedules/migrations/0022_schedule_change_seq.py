@@ -0,0 +1,38 @@
+# Generated by Django 3.1.2 on 2026-10-18 07:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0021_changecounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleTombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schedule_id', models.IntegerField()),
+                ('change_seq', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ('change_seq', 'schedule_id'),
+            },
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['change_seq', 'id'], name='schedule_change_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduletombstone',
+            index=models.Index(fields=['change_seq', 'schedule_id'], name='tombstone_change_seq_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+from hashlib import blake2b
+
+from django.db import migrations
+
+CHUNK_SIZE = 10000
+
+
+def content_digest(subject, content):
+    # frozen copy of utils.models.content_digest
+    data = f'{len(subject)}:{subject}{content}'.encode()
+    return blake2b(data, digest_size=32).hexdigest()
+
+
+def move_text_to_content(apps, schema_editor):
+    Schedule = apps.get_model('schedules', 'Schedule')
+    Content = apps.get_model('schedules', 'Content')
+    last_id = 0
+    while True:
+        schedules = list(
+            Schedule.objects.filter(pk__gt=last_id).order_by('pk').only(
+                'id', 'subject', 'content'
+            )[:CHUNK_SIZE]
+        )
+        if not schedules:
+            break
+        texts = {
+            content_digest(schedule.subject, schedule.content):
+            (schedule.subject, schedule.content) for schedule in schedules
+        }
+        Content.objects.bulk_create([
+            Content(digest=digest, subject=subject, content=content)
+            for digest, (subject, content) in texts.items()
+        ], ignore_conflicts=True)
+        content_ids = dict(
+            Content.objects.filter(digest__in=texts).values_list(
+                'digest', 'id'
+            )
+        )
+        for schedule in schedules:
+            schedule.body_id = content_ids[
+                content_digest(schedule.subject, schedule.content)
+            ]
+        Schedule.objects.bulk_update(schedules, ['body'], batch_size=1000)
+        last_id = schedules[-1].pk
+
+
+def move_content_to_text(apps, schema_editor):
+    Schedule = apps.get_model('schedules', 'Schedule')
+    schedules = Schedule.objects.select_related('body')
+    for schedule in schedules.iterator(chunk_size=CHUNK_SIZE):
+        schedule.subject = schedule.body.subject
+        schedule.content = schedule.body.content
+        schedule.save(update_fields=['subject', 'content'])
+
+
+class Migration(migrations.Migration):
+    # the rows are copied in a migration of their own, so that its
+    # transaction has committed before 0026 alters the table: PostgreSQL
+    # refuses ALTER TABLE while deferred foreign key checks are pending
+
+    dependencies = [
+        ('schedules', '0024_content'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_text_to_content, move_content_to_text),
+    ]
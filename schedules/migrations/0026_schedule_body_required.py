@@ -0,0 +1,29 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0025_schedule_body_data'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='schedule',
+            name='body',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='schedules.content'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='schedule',
+            unique_together={('description', 'body', 'frequency', 'start_date', 'end_date')},
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='content',
+        ),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='subject',
+        ),
+    ]
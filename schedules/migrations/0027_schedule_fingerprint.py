@@ -0,0 +1,68 @@
+from datetime import timedelta, timezone
+from hashlib import blake2b
+
+from django.db import migrations, models
+
+CHUNK_SIZE = 10000
+
+
+def schedule_fingerprint(
+    description, body_digest, frequency, start_date, end_date
+):
+    # frozen copy of utils.models.schedule_fingerprint
+    data = '|'.join((
+        f'{len(description)}:{description}', body_digest,
+        str(frequency // timedelta(microseconds=1)),
+        start_date.astimezone(timezone.utc).isoformat(),
+        end_date.astimezone(timezone.utc).isoformat()
+    )).encode()
+    return blake2b(data, digest_size=32).hexdigest()
+
+
+def fill_fingerprints(apps, schema_editor):
+    Schedule = apps.get_model('schedules', 'Schedule')
+    last_id = 0
+    while True:
+        schedules = list(
+            Schedule.objects.filter(pk__gt=last_id).order_by('pk')
+            .select_related('body').only(
+                'id', 'description', 'frequency', 'start_date', 'end_date',
+                'body__digest'
+            )[:CHUNK_SIZE]
+        )
+        if not schedules:
+            break
+        for schedule in schedules:
+            schedule.fingerprint = schedule_fingerprint(
+                schedule.description, schedule.body.digest,
+                schedule.frequency, schedule.start_date, schedule.end_date
+            )
+        Schedule.objects.bulk_update(
+            schedules, ['fingerprint'], batch_size=1000
+        )
+        last_id = schedules[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0026_schedule_body_required'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='fingerprint',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='schedule',
+            name='fingerprint',
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='schedule',
+            unique_together=set(),
+        ),
+    ]
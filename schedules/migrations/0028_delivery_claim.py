@@ -0,0 +1,29 @@
+# Generated by Django 3.1.2 on 2026-10-18 07:50
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0027_schedule_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='delivery',
+            name='claim',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='delivery',
+            name='claimed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='delivery',
+            name='delivered_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, null=True),
+        ),
+    ]
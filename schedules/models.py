@@ -23,6 +23,27 @@ class Recipient(models.Model):
         return f"{self.name}: {self.email_address}"
 
 
+class Content(models.Model):
+    """
+    subject and content of schedules, stored once however many schedules
+    send them and addressed by their digest. Rows are never updated: a
+    schedule whose text changes points at another row instead.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    subject = models.TextField(default='', blank=True)
+    content = models.TextField(default='', blank=True)
+
+    class Meta:
+        ordering = ('id',)
+
+    @classmethod
+    def get_for(cls, subject: str, content: str):
+        return cls.objects.get_or_create(
+            digest=utils_models.content_digest(subject, content),
+            defaults={'subject': subject, 'content': content}
+        )[0]
+
+
 class Schedule(models.Model):
     ACTIVE = "AC"
     NOT_ADDED = "NA"
@@ -35,11 +56,16 @@ class Schedule(models.Model):
         (COMPLETED, "Completed"),
         (PAUSED, "Paused")
     ]
+    # statuses a bulk status change may move schedules from, by target
+    STATUS_TRANSITIONS = {
+        PAUSED: (ACTIVE, NOT_ADDED),
+        ACTIVE: (PAUSED,),
+        COMPLETED: (ACTIVE, NOT_ADDED, PAUSED),
+    }
 
     description = models.TextField(default='', blank=True)
-    subject = models.TextField(default='', blank=True)
+    body = models.ForeignKey(Content, on_delete=models.PROTECT)
     recipients = models.ManyToManyField(Recipient)
-    content = models.TextField(default='', blank=True)
     frequency = models.DurationField(default=timedelta(0))
     start_date = models.DateTimeField(default=utils_models.default_start_date)
     end_date = models.DateTimeField(default=utils_models.default_end_date)
@@ -48,8 +74,66 @@ class Schedule(models.Model):
         choices=SCHEDULE_STATUS_CHOICES,
         default=NOT_ADDED
     )
+    next_run_at = models.DateTimeField(null=True, blank=True)
+    change_seq = models.BigIntegerField(default=0)
+    fingerprint = models.CharField(max_length=64, unique=True, editable=False)
 
     is_cleaned = False
+    # text assigned through the subject and content properties that body
+    # does not point at yet
+    _subject = None
+    _content = None
+
+    @property
+    def subject(self) -> str:
+        if self._subject is not None:
+            return self._subject
+        return self.body.subject if self.body_id else ''
+
+    @subject.setter
+    def subject(self, value: str):
+        self._subject = value
+
+    @property
+    def content(self) -> str:
+        if self._content is not None:
+            return self._content
+        return self.body.content if self.body_id else ''
+
+    @content.setter
+    def content(self, value: str):
+        self._content = value
+
+    @property
+    def body_digest(self) -> str:
+        if self._subject is None and self._content is None and self.body_id:
+            return self.body.digest
+        return utils_models.content_digest(self.subject, self.content)
+
+    def resolve_body(self):
+        """
+        point body at the Content row of the assigned subject and content,
+        creating the row if no schedule used that text before
+        """
+        if (self.body_id is None or self._subject is not None or
+                self._content is not None):
+            self.body = Content.get_for(self.subject, self.content)
+            self._subject = self._content = None
+
+    def update_fingerprint(self):
+        """
+        resolve the body and recompute the fingerprint that enforces the
+        uniqueness of the schedule
+        """
+        self.resolve_body()
+        self.fingerprint = utils_models.schedule_fingerprint(
+            self.description, self.body.digest, self.frequency,
+            self.start_date, self.end_date
+        )
+
+    def full_clean(self, *args, **kwargs):
+        self.update_fingerprint()
+        super().full_clean(*args, **kwargs)
 
     def clean(self, *args, **kwargs):
         super().clean(*args, **kwargs)
@@ -63,13 +147,35 @@ class Schedule(models.Model):
     def save(self, *args, **kwargs):
         if not self.is_cleaned:
             self.clean()
+        if self.next_run_at is None:
+            self.next_run_at = self.start_date
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'body', 'fingerprint'} & set(
+            update_fields
+        ):
+            self.update_fingerprint()
         super().save(*args, **kwargs)
 
     class Meta:
-        unique_together = (
-            'description', 'subject', 'content', 'frequency',
-            'start_date', 'end_date'
-        )
+        indexes = [
+            models.Index(
+                fields=['status', 'next_run_at'],
+                name='schedule_status_next_run_idx'
+            ),
+            models.Index(
+                fields=['change_seq', 'id'], name='schedule_change_seq_idx'
+            ),
+            models.Index(
+                fields=['status', 'id'], name='schedule_status_id_idx'
+            ),
+            models.Index(
+                fields=['frequency', 'id'], name='schedule_frequency_id_idx'
+            ),
+            models.Index(
+                fields=['start_date'], name='schedule_start_date_idx'
+            ),
+            models.Index(fields=['end_date'], name='schedule_end_date_idx')
+        ]
         ordering = ('id',)
 
 
@@ -81,3 +187,57 @@ class Interval(models.Model):
 
     class Meta:
         ordering = ('id',)
+
+
+class Delivery(models.Model):
+    """
+    ledger of the recipients a run of a schedule was delivered to, so
+    that retried or overlapping sends of the same run skip them. A send
+    claims its recipients before sending: the row is written with the
+    claim of the send and no delivered_at, and is stamped once sent.
+    """
+    schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE)
+    scheduled_run_at = models.DateTimeField()
+    recipient = models.ForeignKey(Recipient, on_delete=models.CASCADE)
+    claim = models.CharField(max_length=32, blank=True, default='')
+    claimed_at = models.DateTimeField(default=timezone.now)
+    delivered_at = models.DateTimeField(null=True, default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['schedule', 'scheduled_run_at', 'recipient'],
+                name='delivery_unique_run_recipient'
+            )
+        ]
+        ordering = ('id',)
+
+
+class ChangeCounter(models.Model):
+    """
+    monotonically increasing version of a collection, bumped in the same
+    transaction as every write to it
+    """
+    SCHEDULES = 'schedules'
+
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+
+class ScheduleTombstone(models.Model):
+    """
+    record of a deleted schedule for the changes endpoint
+    """
+    schedule_id = models.IntegerField()
+    change_seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['change_seq', 'schedule_id'],
+                name='tombstone_change_seq_idx'
+            )
+        ]
+        ordering = ('change_seq', 'schedule_id')
@@ -1,11 +1,15 @@
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 from django.core.validators import EmailValidator
+from django.db import transaction
 
+from schedules.engine import schedule_changed
 from schedules.models import Schedule, Recipient
 from utils import validators
+from utils.models import schedule_data_fingerprint
+from utils.changes import schedules_changed
 from utils.serializers import create_or_update_recipients,\
-    create_or_get_interval
+    create_or_get_interval, upsert_recipients, bulk_create_schedules,\
+    existing_fingerprints, BULK_BATCH_SIZE
 
 
 class RecipientSerializer(serializers.Serializer):
@@ -18,7 +22,97 @@ class RecipientSerializer(serializers.Serializer):
         return Recipient.objects.create(**validated_data)
 
 
+class ScheduleListSerializer(serializers.ListSerializer):
+    """
+    validates and creates many schedules at once. Uniqueness is checked for
+    the whole batch with one query and everything is inserted with
+    bulk_create inside one transaction.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.child.validators = [
+            validator for validator in self.child.validators
+            if not isinstance(validator, validators.UniqueScheduleValidator)
+        ]
+
+    def to_internal_value(self, data):
+        validated_data = super().to_internal_value(data)
+
+        fingerprints = [
+            schedule_data_fingerprint(item) for item in validated_data
+        ]
+        existing_keys = existing_fingerprints(fingerprints)
+        errors, has_errors = [], False
+        for key in fingerprints:
+            if key in existing_keys:
+                errors.append({
+                    'non_field_errors': [
+                        validators.FIELDS_NOT_UNIQUE_TOGETHER_ERROR
+                    ]
+                })
+                has_errors = True
+            else:
+                errors.append({})
+            existing_keys.add(key)
+
+        if has_errors:
+            raise serializers.ValidationError(errors)
+        return validated_data
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            schedules = bulk_create_schedules([
+                Schedule(
+                    description=item['description'],
+                    subject=item['subject'],
+                    content=item['content'],
+                    frequency=item['frequency'],
+                    start_date=item['start_date'],
+                    end_date=item['end_date'],
+                    next_run_at=item['start_date']
+                ) for item in validated_data
+            ])
+
+            recipient_ids = upsert_recipients([
+                recipient for item in validated_data
+                for recipient in item['recipients']
+            ])
+            through = Schedule.recipients.through
+            through.objects.bulk_create([
+                through(
+                    schedule_id=schedule.pk,
+                    recipient_id=recipient_ids[recipient['email_address']]
+                )
+                for schedule, item in zip(schedules, validated_data)
+                for recipient in item['recipients']
+            ], batch_size=BULK_BATCH_SIZE)
+
+            frequencies = {}
+            for schedule in schedules:
+                frequencies.setdefault(schedule.frequency, schedule)
+            for schedule in frequencies.values():
+                create_or_get_interval(schedule)
+            schedules_changed(schedule.pk for schedule in schedules)
+        for schedule in schedules:
+            schedule_changed(schedule)
+        return schedules
+
+
+SCHEDULE_UPDATE_FIELDS = (
+    'description', 'subject', 'content', 'frequency', 'start_date',
+    'end_date', 'status'
+)
+# fields a schedule list can be restricted to with ?fields=
+SCHEDULE_SPARSE_FIELDS = ('id', 'recipients') + SCHEDULE_UPDATE_FIELDS
+# serializer fields stored in a column of another name
+SCHEDULE_UPDATE_COLUMNS = {'subject': 'body', 'content': 'body'}
+SCHEDULE_FINGERPRINT_COLUMNS = {
+    'description', 'body', 'frequency', 'start_date', 'end_date'
+}
+
+
 class ScheduleSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
     description = serializers.CharField()
     subject = serializers.CharField(required=True)
     recipients = RecipientSerializer(many=True)
@@ -31,76 +125,98 @@ class ScheduleSerializer(serializers.Serializer):
         allow_blank=True
     )
 
+    def __init__(self, *args, fields=None, **kwargs):
+        """
+        fields restricts the serialized output to the named fields
+        """
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
+        list_serializer_class = ScheduleListSerializer
         validators = [
-            UniqueTogetherValidator(
-                queryset=Schedule.objects.all(),
-                fields=[
-                    'description', 'subject', 'content',
-                    'frequency', 'start_date', 'end_date'
-                ],
-                message=validators.FIELDS_NOT_UNIQUE_TOGETHER_ERROR
+            validators.UniqueScheduleValidator(
+                queryset=Schedule.objects.all()
             )
         ]
 
     def validate(self, data):
         """
-        Check input fields for constraints
+        Check input fields for constraints. A partial update only checks
+        the fields it touches, and the date invariants against the stored
+        values of the fields it leaves alone.
         """
-        validators.start_date_after_today(data['start_date'])
-        validators.start_date_before_end_date(
-            data['start_date'], data['end_date']
-        )
-        validators.frequency_not_greater_than_end_date(
-            data['frequency'], data['start_date'], data['end_date']
-        )
-        validators.recipients_less_than_500(data['recipients'])
-        validators.recipients_not_contains_duplicates(data['recipients'])
+        def value(field):
+            return data[field] if field in data else getattr(
+                self.instance, field
+            )
+
+        touched = set(data) if self.partial else set(self.fields)
+        if 'start_date' in touched:
+            validators.start_date_after_today(data['start_date'])
+        if touched & {'start_date', 'end_date'}:
+            validators.start_date_before_end_date(
+                value('start_date'), value('end_date')
+            )
+        if touched & {'start_date', 'end_date', 'frequency'}:
+            validators.frequency_not_greater_than_end_date(
+                value('frequency'), value('start_date'), value('end_date')
+            )
+        if 'recipients' in touched:
+            validators.recipients_less_than_500(data['recipients'])
+            validators.recipients_not_contains_duplicates(data['recipients'])
 
         return data
 
     def create(self, validated_data):
-        schedule = Schedule.objects.create(
-            description=validated_data['description'],
-            subject=validated_data['subject'],
-            content=validated_data['content'],
-            frequency=validated_data['frequency'],
-            start_date=validated_data['start_date'],
-            end_date=validated_data['end_date']
-        )
-        recipients = validated_data['recipients']
-        create_or_update_recipients(schedule, recipients, False)
+        with transaction.atomic():
+            schedule = Schedule.objects.create(
+                description=validated_data['description'],
+                subject=validated_data['subject'],
+                content=validated_data['content'],
+                frequency=validated_data['frequency'],
+                start_date=validated_data['start_date'],
+                end_date=validated_data['end_date']
+            )
+            recipients = validated_data['recipients']
+            create_or_update_recipients(schedule, recipients, False)
+            schedules_changed([schedule.pk])
         interval = create_or_get_interval(schedule)
+        schedule_changed(schedule)
         return schedule
 
     def update(self, instance, validated_data):
-        instance.description = validated_data.get(
-            'description', instance.description
-        )
-        instance.subject = validated_data.get(
-            'subject', instance.subject
-        )
-        instance.content = validated_data.get(
-            'content', instance.content
-        )
-        instance.frequency = validated_data.get(
-            'frequency', instance.frequency
-        )
-        instance.start_date = validated_data.get(
-            'start_date', instance.start_date
-        )
-        instance.end_date = validated_data.get(
-            'end_date', instance.end_date
-        )
-        instance.status = validated_data.get(
-            'status', instance.status
-        )
-
-        recipients = validated_data.get('recipients')
-        if recipients:
-            create_or_update_recipients(instance, recipients, True)
-
-        instance.save()
-
-        interval = create_or_get_interval(schedule=instance)
+        """
+        write only the columns of the fields in validated_data, so that a
+        partial update neither rewrites the rest of the row nor reads the
+        Content row or recipients it does not change
+        """
+        previous_start_date = instance.start_date
+        update_fields = set()
+        for field in SCHEDULE_UPDATE_FIELDS:
+            if field in validated_data:
+                setattr(instance, field, validated_data[field])
+                update_fields.add(SCHEDULE_UPDATE_COLUMNS.get(field, field))
+        if instance.start_date != previous_start_date:
+            instance.next_run_at = instance.start_date
+            update_fields.add('next_run_at')
+        if update_fields & SCHEDULE_FINGERPRINT_COLUMNS:
+            update_fields.add('fingerprint')
+        if self.partial:
+            # validate() checked the touched fields and the date invariants
+            instance.is_cleaned = True
+
+        with transaction.atomic():
+            recipients = validated_data.get('recipients')
+            if recipients:
+                create_or_update_recipients(instance, recipients, True)
+            if update_fields:
+                instance.save(update_fields=update_fields)
+            schedules_changed([instance.pk])
+
+        if 'frequency' in update_fields:
+            interval = create_or_get_interval(schedule=instance)
+        schedule_changed(instance)
         return instance
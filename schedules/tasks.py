@@ -1,47 +1,163 @@
+import logging
 from datetime import timedelta
+from uuid import uuid4
 
 from celery import shared_task
-from django.db.models import Q
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.utils.dateparse import parse_datetime
 
-from schedules.models import Schedule, Interval
+from schedules.engine import scheduling_engine
+from schedules.models import Schedule
 from mail_api.settings import EMAIL_HOST_USER
-from utils.tasks import discover_schedules
+from utils import metrics
+from utils.mail import connection_pool, delivery_engine, build_messages
+from utils.tasks import discover_due_schedules, activate_due_schedules,\
+    complete_finished_schedules, claim_deliveries, claims_expire_in,\
+    record_deliveries, load_content
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task
-def task_send_email(interval: Interval):
+@metrics.timed(metrics.DISPATCH_DURATION)
+def task_send_email(interval_seconds: float = None):
+    """
+    send every schedule whose next_run_at is due. Status transitions and
+    next_run_at are written with two set based UPDATEs per tick, and only
+    the schedules activated by the first one are sent, each as its own
+    send_email_to_schedule task so that sends spread across workers.
+    interval_seconds restricts the tick to a single frequency.
+
+    With SCHEDULES_ENGINE_ENABLED only the schedules whose fire time,
+    jitter included, has passed in the scheduling engine are looked up.
+    """
     now = timezone.now()
-    interval = interval.interval
-    end_limit = now + interval
-    schedules = Schedule.objects.filter(
-        Q(frequency=interval.interval),
-        Q(status=Schedule.ACTIVE) | Q(status=Schedule.NOT_ADDED),
-    )
+    frequency = None
+    if interval_seconds is not None:
+        frequency = timedelta(seconds=interval_seconds)
 
-    for schedule in schedules:
-        if end_limit >= schedule.end_date:
-            schedule.status = Schedule.COMPLETED
-            schedule.save()
+    engine, candidate_ids = None, None
+    if settings.SCHEDULES_ENGINE_ENABLED:
+        engine = scheduling_engine()
+        engine.refresh()
+        candidate_ids = engine.pop_due(
+            now, settings.SCHEDULES_DISPATCH_BATCH_SIZE
+        )
+        if not candidate_ids:
+            metrics.DISPATCH_DUE.set(0)
+            metrics.ENGINE_SCHEDULES.set(len(engine))
+            return
 
-        if schedule.status == Schedule.NOT_ADDED:
-            if schedule.start_date <= now and schedule.end_date >= end_limit:
-                schedule.status = Schedule.ACTIVE
-                schedule.save()
+    with transaction.atomic():
+        due = list(discover_due_schedules(now, frequency, candidate_ids))
+        to_send = [
+            schedule for schedule in due
+            if schedule.next_run_at <= schedule.end_date
+        ]
+        runs = [(schedule.pk, schedule.next_run_at) for schedule in to_send]
+        activate_due_schedules(to_send, now)
+        complete_finished_schedules([schedule.pk for schedule in due])
+    metrics.DISPATCH_DUE.set(len(due))
+    metrics.DISPATCHED.inc(len(runs))
 
-        if schedule.status == Schedule.ACTIVE:
-            send_email_to_schedule(schedule=schedule)
+    if engine is not None:
+        # candidates that were advanced, completed, skipped because another
+        # tick held their lock or filtered out by frequency are pushed back
+        # with whatever next_run_at and status they now have
+        engine.reload_ids(candidate_ids)
+        metrics.ENGINE_SCHEDULES.set(len(engine))
 
+    # enqueue only once the transaction has committed so that workers see
+    # the ACTIVE status written above
+    for schedule_id, scheduled_run_at in runs:
+        send_email_to_schedule.delay(schedule_id, scheduled_run_at.isoformat())
 
-@shared_task
-def send_email_to_schedule(schedule: Schedule):
-    recipient_list = [
-        recipient.email_address for recipient in schedule.recipients.all()
-    ]
-    send_mail(
-        subject=schedule.subject,
-        message=schedule.content,
-        from_email=EMAIL_HOST_USER,
-        recipient_list=recipient_list
-    )
+
+@shared_task(
+    bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=None
+)
+@metrics.timed(metrics.SEND_DURATION)
+def send_email_to_schedule(
+    self, schedule_id: int, scheduled_run_at: str = None
+):
+    """
+    send the schedule's content to its recipients. Takes the schedule id
+    rather than an instance so that the task arguments serialize to JSON.
+    Schedules paused after they were enqueued are skipped.
+
+    scheduled_run_at is the ISO 8601 time of the run being sent. The
+    recipients of that run are claimed in the delivery ledger under the
+    task id before anything is sent, and the claims are stamped as
+    delivered after every EMAIL_DELIVERY_LEDGER_BATCH_SIZE recipients.
+    A redelivery of a task that died takes its own claims back at once.
+    Recipients delivered by another send of the run are skipped; while
+    another send still holds some, the task is retried once its claims
+    time out, and takes them over if they were not delivered by then.
+    Without scheduled_run_at the ledger is not used.
+
+    Returns the number of recipients sent to and the recipients the mail
+    server rejected, mapped to the error.
+    """
+    schedule = Schedule.objects.prefetch_related('recipients').filter(
+        pk=schedule_id
+    ).exclude(status=Schedule.PAUSED).select_related('body').only(
+        'id', 'body__digest'
+    ).first()
+    if schedule is None:
+        return {'sent': 0, 'failed': {}}
+    subject, content = load_content(schedule.body.digest)
+
+    run_at = parse_datetime(scheduled_run_at) if scheduled_run_at else None
+    recipients = list(schedule.recipients.all())
+    claim = self.request.id or uuid4().hex
+    retry_in = None
+    if run_at is not None:
+        claimed = claim_deliveries(schedule_id, run_at, recipients, claim)
+        if len(claimed) < len(recipients):
+            retry_in = claims_expire_in(schedule_id, run_at, claim)
+        metrics.EMAILS_SKIPPED.inc(len(recipients) - len(claimed))
+        recipients = claimed
+
+    engine = delivery_engine()
+    batch_size = settings.EMAIL_DELIVERY_LEDGER_BATCH_SIZE
+    sent, failed = 0, {}
+    for start in range(0, len(recipients), batch_size):
+        batch = recipients[start:start + batch_size]
+        messages = build_messages(
+            subject=subject,
+            body=content,
+            from_email=EMAIL_HOST_USER,
+            recipients=[recipient.email_address for recipient in batch]
+        )
+        batch_failed = engine.send_each(messages)
+        delivered = [
+            recipient for recipient in batch
+            if recipient.email_address not in batch_failed
+        ]
+        if run_at is not None:
+            record_deliveries(schedule_id, run_at, claim, delivered, [
+                recipient for recipient in batch
+                if recipient.email_address in batch_failed
+            ])
+        sent += len(delivered)
+        failed.update(batch_failed)
+        metrics.EMAILS_SENT.inc(len(delivered))
+        metrics.EMAILS_FAILED.inc(len(batch_failed))
+
+    for recipient, error in failed.items():
+        logger.warning(
+            "schedule %s: sending to %s failed: %s",
+            schedule_id, recipient, error
+        )
+    # eager tasks retry at once, whatever the countdown
+    if retry_in is not None and not self.request.is_eager:
+        raise self.retry(countdown=retry_in)
+    return {'sent': sent, 'failed': failed}
+
+
+@worker_process_shutdown.connect
+def close_connection_pool(**kwargs):
+    connection_pool().close()
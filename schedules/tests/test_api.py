@@ -1,10 +1,13 @@
-from datetime import timedelta, date
+from datetime import timedelta, date, timezone as dt_timezone
 from unittest import skip
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework.serializers import ValidationError
 
 from mail_api.celery import app
+from schedules.beat import DatabaseScheduler
 from schedules.serializers import ScheduleSerializer, RecipientSerializer
 from schedules.models import Schedule, Recipient, Interval
 from utils.testing import create_schedule_input_data, serialize_input_data
@@ -13,6 +16,7 @@ from utils.validators import RECIPIENTS_CONTAIN_DUPLICATES_ERROR,\
     INVALID_EMAIL_ADDRESS_ERROR, END_DATE_NOT_ADDED_ERROR,\
     FREQUENCY_GREATER_THAN_END_DATE_ERROR
 from utils.models import default_date_time
+from utils.serializers import create_or_update_recipients, upsert_recipients
 
 
 class ScheduleSerializerTest(TestCase):
@@ -146,6 +150,24 @@ class ScheduleSerializerTest(TestCase):
         with self.assertRaises(ValidationError):
             serializer_2.is_valid(raise_exception=True)
 
+    def test_unique_validation_is_one_fingerprint_lookup(self):
+        serialize_input_data(recipients=self.recipients)
+        start_date = default_date_time().astimezone(
+            dt_timezone(timedelta(hours=5))
+        )
+        serializer = ScheduleSerializer(data=create_schedule_input_data(
+            content="placeholder: 0", start_date=start_date,
+            recipients=self.recipients
+        ))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(serializer.is_valid())
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"fingerprint" =', queries[0]['sql'])
+        self.assertEqual(
+            serializer.errors['non_field_errors'],
+            [FIELDS_NOT_UNIQUE_TOGETHER_ERROR]
+        )
+
     def test_update_schedule_recipients(self):
         serialize_input_data(recipients=self.recipients)
         self.assertEqual(Schedule.objects.count(), 1)
@@ -290,14 +312,20 @@ class ScheduleSerializerTest(TestCase):
     def test_creating_interval_adds_celery_task(self):
         serialize_input_data(recipients=self.recipients)
         schedule = Schedule.objects.first()
-        self.assertIsNotNone(app.conf.beat_schedule[str(schedule.frequency)])
+        scheduler = DatabaseScheduler(app=app)
+        self.assertIsNotNone(
+            scheduler.schedule[f'interval:{schedule.frequency}']
+        )
 
     def test_updating_interval_adds_new_celery_task(self):
         serialize_input_data(recipients=self.recipients)
         schedule = Schedule.objects.first()
         interval = Interval.objects.first()
         self.assertEqual(interval.interval, schedule.frequency)
-        self.assertIsNotNone(app.conf.beat_schedule[str(interval.interval)])
+        scheduler = DatabaseScheduler(app=app)
+        self.assertIsNotNone(
+            scheduler.schedule[f'interval:{interval.interval}']
+        )
         self.assertEqual(Interval.objects.count(), 1)
 
         new_data = create_schedule_input_data()
@@ -308,11 +336,92 @@ class ScheduleSerializerTest(TestCase):
             serializer.save()
 
         interval = Interval.objects.get(interval=new_data['frequency'])
-        self.assertIsNotNone(app.conf.beat_schedule[str(interval.interval)])
-        # self.assertEqual(len(app.conf.beat_schedule), 2)
+        scheduler._next_poll = 0
+        scheduler.poll()
+        self.assertIsNotNone(
+            scheduler.schedule[f'interval:{interval.interval}']
+        )
         self.assertEqual(Interval.objects.count(), 2)
 
 
+class RecipientUpsertTest(TestCase):
+    def recipients(self, num_recipients):
+        return [
+            {'name': f'test{idx}', 'email_address': f'test{idx}@test.com'}
+            for idx in range(num_recipients)
+        ]
+
+    def test_upsert_reuses_existing_recipients(self):
+        existing = Recipient.objects.create(
+            name='test0', email_address='test0@test.com'
+        )
+        recipient_ids = upsert_recipients(self.recipients(3))
+        self.assertEqual(len(recipient_ids), 3)
+        self.assertEqual(recipient_ids['test0@test.com'], existing.pk)
+        self.assertEqual(Recipient.objects.count(), 3)
+
+    def test_upsert_only_existing_recipients_is_one_query(self):
+        upsert_recipients(self.recipients(5))
+        with self.assertNumQueries(1):
+            recipient_ids = upsert_recipients(self.recipients(5))
+        self.assertEqual(len(recipient_ids), 5)
+
+    def test_recipient_query_count_does_not_grow_with_recipients(self):
+        schedule_small = Schedule.objects.create(content="small")
+        schedule_large = Schedule.objects.create(content="large")
+
+        with CaptureQueriesContext(connection) as small:
+            create_or_update_recipients(
+                schedule_small, self.recipients(10), False
+            )
+        Recipient.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            create_or_update_recipients(
+                schedule_large, self.recipients(200), False
+            )
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(schedule_large.recipients.count(), 200)
+
+    def test_update_only_writes_changed_links(self):
+        schedule = Schedule.objects.create(content="diff")
+        recipients = self.recipients(300)
+        create_or_update_recipients(schedule, recipients, False)
+        through = Schedule.recipients.through
+        unchanged = set(through.objects.exclude(
+            recipient__email_address='test0@test.com'
+        ).values_list('id', flat=True))
+
+        recipients[0] = {'name': 'new', 'email_address': 'new@test.com'}
+        with CaptureQueriesContext(connection) as queries:
+            create_or_update_recipients(schedule, recipients, True)
+
+        link_writes = [
+            query['sql'] for query in queries
+            if query['sql'].startswith(('INSERT', 'DELETE')) and
+            through._meta.db_table in query['sql']
+        ]
+        self.assertEqual(len(link_writes), 2)
+        self.assertEqual(
+            set(schedule.recipients.values_list('email_address', flat=True)),
+            {recipient['email_address'] for recipient in recipients}
+        )
+        self.assertTrue(
+            unchanged <= set(through.objects.values_list('id', flat=True))
+        )
+
+    def test_update_with_same_recipients_writes_no_links(self):
+        schedule = Schedule.objects.create(content="same")
+        create_or_update_recipients(schedule, self.recipients(5), False)
+        with CaptureQueriesContext(connection) as queries:
+            create_or_update_recipients(schedule, self.recipients(5), True)
+        self.assertFalse([
+            query for query in queries
+            if query['sql'].startswith(('INSERT', 'DELETE'))
+        ])
+        self.assertEqual(schedule.recipients.count(), 5)
+
+
 class RecipientSerializerTest(TestCase):
     def test_invalid_email_raises_validation_error(self):
         recipient = {'name': 'test', 'email_address': 'test'}
@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.test import TestCase
+
+from mail_api.celery import app
+from schedules.beat import DatabaseScheduler
+from schedules.models import Interval
+
+
+class DatabaseSchedulerTest(TestCase):
+    def scheduler(self):
+        return DatabaseScheduler(app=app)
+
+    def poll(self, scheduler):
+        scheduler._next_poll = 0
+        scheduler.poll()
+
+    def interval_entries(self, scheduler):
+        return {
+            name: entry for name, entry in scheduler.schedule.items()
+            if name.startswith('interval:')
+        }
+
+    def test_intervals_are_loaded_at_startup(self):
+        Interval.objects.create(interval=timedelta(days=1))
+        Interval.objects.create(interval=timedelta(hours=6))
+
+        entries = self.interval_entries(self.scheduler())
+
+        self.assertEqual(len(entries), 2)
+        entry = entries['interval:6:00:00']
+        self.assertEqual(entry.task, 'schedules.tasks.task_send_email')
+        self.assertEqual(entry.args, (timedelta(hours=6).total_seconds(),))
+        self.assertEqual(entry.schedule.run_every, timedelta(hours=6))
+
+    def test_static_entries_are_kept(self):
+        scheduler = self.scheduler()
+        self.assertIn('dispatch-due-schedules', scheduler.schedule)
+
+    def test_new_and_removed_intervals_are_picked_up(self):
+        daily = Interval.objects.create(interval=timedelta(days=1))
+        scheduler = self.scheduler()
+
+        Interval.objects.create(interval=timedelta(hours=6))
+        self.poll(scheduler)
+        self.assertEqual(len(self.interval_entries(scheduler)), 2)
+
+        daily.delete()
+        self.poll(scheduler)
+        self.assertEqual(
+            list(self.interval_entries(scheduler)), ['interval:6:00:00']
+        )
+
+    def test_unchanged_marker_does_not_reload(self):
+        Interval.objects.create(interval=timedelta(days=1))
+        scheduler = self.scheduler()
+        with self.assertNumQueries(1):
+            self.poll(scheduler)
+
+    def test_poll_waits_for_poll_interval(self):
+        scheduler = self.scheduler()
+        with self.assertNumQueries(0):
+            scheduler.poll()
+
+    def test_heap_is_rebuilt_only_after_changes(self):
+        scheduler = self.scheduler()
+        scheduler.populate_heap()
+        heap = scheduler._heap
+        self.assertTrue(scheduler.schedules_equal(None, scheduler.schedule))
+
+        Interval.objects.create(interval=timedelta(hours=6))
+        self.poll(scheduler)
+        self.assertFalse(scheduler.schedules_equal(None, scheduler.schedule))
+        scheduler.populate_heap()
+        self.assertIsNot(scheduler._heap, heap)
+        self.assertEqual(
+            len(scheduler._heap), len(scheduler.schedule)
+        )
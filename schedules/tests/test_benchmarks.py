@@ -0,0 +1,47 @@
+import json
+
+from django.test import TestCase
+
+from benchmarks.seed import seed_to_size
+from benchmarks.suite import run_suite
+from schedules.models import Schedule
+
+
+class BenchmarkSuiteTest(TestCase):
+    def test_seeding_tops_up_to_size(self):
+        seed_to_size(4, fanout=2)
+        first = list(
+            Schedule.objects.values_list('body__content', 'frequency')
+        )
+        seed_to_size(6, fanout=2)
+        seed_to_size(5, fanout=2)
+
+        self.assertEqual(Schedule.objects.count(), 6)
+        self.assertEqual(
+            list(Schedule.objects.values_list(
+                'body__content', 'frequency'
+            )[:4]),
+            first
+        )
+        self.assertEqual(
+            Schedule.recipients.through.objects.count(), 12
+        )
+
+    def test_suite_reports_every_benchmark_as_json(self):
+        report = run_suite(sizes=[6], fanout=2, repeat=2, sends=2)
+        result = json.loads(json.dumps(report))['results']['6']
+
+        for name in ('list', 'detail', 'create', 'update', 'tick'):
+            self.assertLessEqual(
+                result[name]['min_ms'], result[name]['max_ms']
+            )
+            self.assertGreater(result[name]['queries'], 0)
+        # the create benchmark added one schedule per repeat
+        self.assertEqual(
+            result['tick']['dispatched_per_tick'], Schedule.objects.count()
+        )
+        self.assertEqual(
+            set(result['sends']), {'locmem', 'smtp_pool', 'smtp_asyncio'}
+        )
+        for sends in result['sends'].values():
+            self.assertEqual(sends['emails'], 4)
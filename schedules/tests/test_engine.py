@@ -0,0 +1,212 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from schedules import engine as engine_module
+from schedules.engine import SchedulingEngine, scheduling_engine
+from schedules.models import Schedule
+from schedules.serializers import ScheduleSerializer
+from mail_api.celery import app
+from schedules.tasks import task_send_email
+from utils.testing import create_schedule_input_data, serialize_input_data
+from utils.models import default_date_time
+from utils.tasks import change_schedule_status
+
+
+class SchedulingEngineTest(TestCase):
+    def setUp(self):
+        self.recipients = [
+            {'name': 'test', 'email_address': 'test@gmail.com'}
+        ]
+        self.addCleanup(setattr, engine_module, '_engine', None)
+        engine_module._engine = None
+
+    def create_schedules(self, num_schedules=1, **kwargs):
+        kwargs.setdefault('frequency', timedelta(hours=1))
+        kwargs.setdefault('end_date', default_date_time(days=5))
+        serialize_input_data(
+            recipients=self.recipients, num_schedules=num_schedules,
+            **kwargs
+        )
+
+    def test_load_pops_only_due_schedules_earliest_first(self):
+        self.create_schedules(start_date=default_date_time(hours=2))
+        self.create_schedules(
+            content="later", start_date=default_date_time(hours=3)
+        )
+        self.create_schedules(
+            content="future", start_date=default_date_time(days=2)
+        )
+        Schedule.objects.filter(body__content="future: 0").update(
+            status=Schedule.PAUSED
+        )
+        engine = SchedulingEngine(jitter=0)
+        engine.load()
+
+        self.assertEqual(len(engine), 2)
+        self.assertEqual(engine.pop_due(default_date_time(hours=1)), [])
+        expected = list(
+            Schedule.objects.exclude(status=Schedule.PAUSED).order_by(
+                'start_date'
+            ).values_list('pk', flat=True)
+        )
+        self.assertEqual(
+            engine.pop_due(default_date_time(hours=4)), expected
+        )
+        self.assertEqual(len(engine), 0)
+        self.assertIsNone(engine.next_fire_time())
+
+    def test_upsert_replaces_and_remove_drops_entries(self):
+        engine = SchedulingEngine(jitter=0)
+        now = timezone.now()
+        engine.upsert(1, now, Schedule.ACTIVE)
+        engine.upsert(1, now + timedelta(hours=1), Schedule.ACTIVE)
+        engine.upsert(2, now, Schedule.ACTIVE)
+        engine.remove(2)
+
+        self.assertEqual(engine.pop_due(now), [])
+        self.assertEqual(engine.next_fire_time(), now + timedelta(hours=1))
+        engine.upsert(1, now, Schedule.COMPLETED)
+        self.assertIsNone(engine.next_fire_time())
+
+    def test_jitter_is_deterministic_and_bounded(self):
+        engine = SchedulingEngine(jitter=60)
+        offsets = [engine.jitter_for(pk) for pk in range(1, 101)]
+
+        self.assertEqual(offsets, [
+            SchedulingEngine(jitter=60).jitter_for(pk)
+            for pk in range(1, 101)
+        ])
+        self.assertTrue(all(
+            timedelta(0) <= offset < timedelta(seconds=60)
+            for offset in offsets
+        ))
+        self.assertGreater(len(set(offsets)), 90)
+
+    def test_jitter_delays_fire_time(self):
+        engine = SchedulingEngine(jitter=60)
+        now = timezone.now()
+        engine.upsert(7, now, Schedule.ACTIVE)
+
+        self.assertEqual(engine.pop_due(now + engine.jitter_for(7) / 2), [])
+        self.assertEqual(engine.pop_due(now + engine.jitter_for(7)), [7])
+
+    def test_serializer_updates_loaded_engine(self):
+        engine = scheduling_engine()
+        engine.load()
+        data = create_schedule_input_data(
+            recipients=self.recipients,
+            frequency=timedelta(hours=1),
+            end_date=default_date_time(days=5)
+        )
+        serializer = ScheduleSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        schedule = serializer.save()
+        self.assertEqual(
+            engine.next_fire_time(),
+            schedule.start_date + engine.jitter_for(schedule.pk)
+        )
+
+        data['start_date'] = default_date_time(days=1)
+        serializer = ScheduleSerializer(instance=schedule, data=data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(
+            engine.next_fire_time(),
+            data['start_date'] + engine.jitter_for(schedule.pk)
+        )
+
+        response = self.client.delete(f"/api/schedules/{schedule.pk}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(engine.next_fire_time())
+
+    def test_unloaded_engine_is_not_touched(self):
+        self.create_schedules()
+        self.assertIsNone(engine_module._engine)
+
+
+@override_settings(SCHEDULES_ENGINE_ENABLED=True, SCHEDULES_ENGINE_JITTER=0)
+class EngineDispatchTest(TestCase):
+    def setUp(self):
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+        self.addCleanup(setattr, engine_module, '_engine', None)
+        engine_module._engine = None
+        self.recipients = [
+            {'name': 'test', 'email_address': 'test@gmail.com'}
+        ]
+
+    def test_only_due_schedules_are_dispatched_and_reinserted(self):
+        serialize_input_data(
+            recipients=self.recipients, num_schedules=2,
+            frequency=timedelta(hours=1), end_date=default_date_time(days=5)
+        )
+        serialize_input_data(
+            recipients=self.recipients, content="future",
+            frequency=timedelta(hours=1),
+            start_date=default_date_time(days=1),
+            end_date=default_date_time(days=5)
+        )
+
+        task_send_email()
+        self.assertEqual(len(mail.outbox), 2)
+        engine = scheduling_engine()
+        self.assertEqual(len(engine), 3)
+        self.assertGreater(engine.next_fire_time(), timezone.now())
+
+        task_send_email()
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_schedules_created_elsewhere_are_picked_up(self):
+        engine = scheduling_engine()
+        engine.load()
+        engine_module._engine = None
+        serialize_input_data(
+            recipients=self.recipients, frequency=timedelta(hours=1),
+            end_date=default_date_time(days=5)
+        )
+        engine_module._engine = engine
+
+        task_send_email()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_paused_candidates_are_dropped_until_reloaded(self):
+        serialize_input_data(
+            recipients=self.recipients, frequency=timedelta(hours=1),
+            end_date=default_date_time(days=5)
+        )
+        engine = scheduling_engine()
+        engine.load()
+        Schedule.objects.update(status=Schedule.PAUSED)
+
+        task_send_email()
+        self.assertEqual(len(engine), 0)
+        Schedule.objects.update(status=Schedule.ACTIVE)
+        engine.reload_ids(Schedule.objects.values_list('pk', flat=True))
+
+        task_send_email()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_status_changes_elsewhere_are_picked_up(self):
+        serialize_input_data(
+            recipients=self.recipients, frequency=timedelta(hours=1),
+            end_date=default_date_time(days=5)
+        )
+        engine = scheduling_engine()
+        engine.load()
+        engine_module._engine = None
+        change_schedule_status(Schedule.objects.all(), Schedule.PAUSED)
+        engine_module._engine = engine
+
+        task_send_email()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(len(engine), 0)
+
+        engine_module._engine = None
+        change_schedule_status(Schedule.objects.all(), Schedule.ACTIVE)
+        engine_module._engine = engine
+
+        task_send_email()
+        self.assertEqual(len(mail.outbox), 1)
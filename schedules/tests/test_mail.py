@@ -0,0 +1,260 @@
+from unittest.mock import patch
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage
+from django.test import TestCase, override_settings
+
+from utils.async_mail import AsyncDeliveryEngine
+from utils.mail import ConnectionPool, build_messages, delivery_engine,\
+    SEND_MODE_BCC, SEND_MODE_PER_RECIPIENT, SEND_MODE_TO
+from utils.testing import SMTPSink
+
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+def message(num=0):
+    return EmailMessage(
+        subject="subject", body=f"body {num}",
+        from_email="sender@test.com", to=["test@test.com"]
+    )
+
+
+class SMTPSinkTestCase(TestCase):
+    rejected = ()
+
+    def setUp(self):
+        self.sink = SMTPSink(rejected=self.rejected).__enter__()
+        self.addCleanup(self.sink.__exit__)
+        settings_override = override_settings(
+            EMAIL_BACKEND=SMTP_BACKEND,
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.sink.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def pool(self, **kwargs):
+        pool = ConnectionPool(**kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+
+class ConnectionPoolTest(SMTPSinkTestCase):
+    def test_connection_is_reused_across_sends(self):
+        pool = self.pool()
+        for num in range(5):
+            self.assertEqual(pool.send_messages([message(num)]), 1)
+        self.assertEqual(len(self.sink.messages), 5)
+        self.assertEqual(self.sink.connections, 1)
+
+    def test_connection_is_recycled_after_max_messages(self):
+        pool = self.pool(max_messages=2)
+        for num in range(5):
+            pool.send_messages([message(num)])
+        self.assertEqual(len(self.sink.messages), 5)
+        self.assertEqual(self.sink.connections, 3)
+
+    def test_idle_connection_is_closed(self):
+        pool = self.pool(idle_timeout=60)
+        pool.send_messages([message()])
+        pool._idle[0].last_used -= 120
+        pool.send_messages([message()])
+        self.assertEqual(self.sink.connections, 2)
+
+    def test_unhealthy_connection_is_replaced(self):
+        pool = self.pool(health_check_interval=1)
+        pool.send_messages([message()])
+        pooled = pool._idle[0]
+        pooled.last_used -= 5
+        pooled.connection.connection.close()
+
+        self.assertEqual(pool.send_messages([message()]), 1)
+        self.assertEqual(self.sink.connections, 2)
+        self.assertEqual(len(self.sink.messages), 2)
+
+    def test_failed_connection_is_not_returned_to_pool(self):
+        pool = self.pool()
+        with self.assertRaises(RuntimeError):
+            with pool.connection():
+                raise RuntimeError
+        self.assertEqual(pool._idle, [])
+
+
+class BuildMessagesTest(TestCase):
+    def setUp(self):
+        self.recipients = [f'test{idx}@test.com' for idx in range(5)]
+
+    def test_per_recipient_messages_do_not_share_addresses(self):
+        messages = build_messages(
+            "subject", "body", "sender@test.com", self.recipients,
+            mode=SEND_MODE_PER_RECIPIENT
+        )
+        self.assertEqual(len(messages), 5)
+        mime_messages = [message.message() for message in messages]
+        self.assertEqual(
+            [mime['To'] for mime in mime_messages], self.recipients
+        )
+        self.assertEqual(
+            len({mime['Message-ID'] for mime in mime_messages}), 5
+        )
+        self.assertEqual(mime_messages[0]['Subject'], "subject")
+        self.assertEqual(mime_messages[0].get_payload(), "body")
+
+    def test_bcc_messages_are_chunked(self):
+        messages = build_messages(
+            "subject", "body", "sender@test.com", self.recipients,
+            mode=SEND_MODE_BCC, chunk_size=2
+        )
+        self.assertEqual(
+            [message.recipients() for message in messages],
+            [self.recipients[:2], self.recipients[2:4], self.recipients[4:]]
+        )
+        self.assertIsNone(messages[0].message()['To'])
+        self.assertIsNone(messages[0].message()['Bcc'])
+
+    def test_to_mode_sends_a_single_message(self):
+        messages = build_messages(
+            "subject", "body", "sender@test.com", self.recipients,
+            mode=SEND_MODE_TO
+        )
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0].to, self.recipients)
+
+
+class SendEachTest(SMTPSinkTestCase):
+    rejected = ('bad@test.com',)
+
+    def test_rejected_recipients_are_reported(self):
+        recipients = ['test@test.com', 'bad@test.com', 'test2@test.com']
+        messages = build_messages(
+            "subject", "body", "sender@test.com", recipients,
+            mode=SEND_MODE_PER_RECIPIENT
+        )
+        failed = self.pool().send_each(messages)
+
+        self.assertEqual(list(failed), ['bad@test.com'])
+        self.assertEqual(
+            [envelope for envelope, data in self.sink.messages],
+            [['test@test.com'], ['test2@test.com']]
+        )
+        self.assertEqual(self.sink.connections, 1)
+
+    def test_partly_refused_bcc_is_reported_per_recipient(self):
+        recipients = ['test@test.com', 'bad@test.com', 'test2@test.com']
+        messages = build_messages(
+            "subject", "body", "sender@test.com", recipients,
+            mode=SEND_MODE_BCC
+        )
+        failed = self.pool().send_each(messages)
+
+        self.assertEqual(list(failed), ['bad@test.com'])
+        self.assertTrue(failed['bad@test.com'].startswith('550'))
+        self.assertEqual(
+            self.sink.messages[0][0], ['test@test.com', 'test2@test.com']
+        )
+
+
+class AsyncDeliveryEngineTest(SMTPSinkTestCase):
+    rejected = ('bad@test.com',)
+
+    def engine(self, **kwargs):
+        engine = AsyncDeliveryEngine(**kwargs)
+        self.addCleanup(engine.close)
+        return engine
+
+    def messages(self, recipients, mode=SEND_MODE_PER_RECIPIENT):
+        return build_messages(
+            "subject", ".leading dot\nbody", "sender@test.com", recipients,
+            mode=mode
+        )
+
+    def test_messages_are_delivered_over_bounded_connections(self):
+        recipients = [f'test{idx}@test.com' for idx in range(20)]
+        engine = self.engine(connections_per_host=4, queue_size=2)
+
+        failed = engine.send_each(self.messages(recipients))
+
+        self.assertEqual(failed, {})
+        self.assertEqual(
+            sorted(envelope[0] for envelope, data in self.sink.messages),
+            sorted(recipients)
+        )
+        self.assertLessEqual(self.sink.connections, 4)
+        self.assertIn(b'\r\n..leading dot\r\n', self.sink.messages[0][1])
+
+    def test_refused_recipients_are_reported(self):
+        recipients = ['test@test.com', 'bad@test.com', 'test2@test.com']
+        engine = self.engine(connections_per_host=2)
+
+        failed = engine.send_each(self.messages(recipients))
+        self.assertEqual(list(failed), ['bad@test.com'])
+        self.assertEqual(len(self.sink.messages), 2)
+
+        failed = engine.send_each(self.messages(recipients, SEND_MODE_BCC))
+        self.assertEqual(list(failed), ['bad@test.com'])
+        self.assertEqual(
+            self.sink.messages[-1][0], ['test@test.com', 'test2@test.com']
+        )
+
+    def test_connections_are_kept_across_batches(self):
+        engine = self.engine(connections_per_host=2)
+        for num in range(3):
+            failed = engine.send_each(
+                self.messages([f'test{num}@test.com'])
+            )
+            self.assertEqual(failed, {})
+        self.assertEqual(len(self.sink.messages), 3)
+        self.assertEqual(self.sink.connections, 1)
+
+    def test_idle_connection_is_replaced(self):
+        engine = self.engine(idle_timeout=60)
+        engine.send_each(self.messages(['test@test.com']))
+        engine._idle[0].last_used -= 120
+        engine.send_each(self.messages(['test@test.com']))
+        self.assertEqual(self.sink.connections, 2)
+        self.assertEqual(len(self.sink.messages), 2)
+
+    def test_login_with_credentials(self):
+        with override_settings(
+            EMAIL_HOST_USER='user', EMAIL_HOST_PASSWORD='password'
+        ):
+            failed = self.engine().send_each(
+                self.messages(['test@test.com'])
+            )
+        self.assertEqual(failed, {})
+        self.assertEqual(len(self.sink.messages), 1)
+
+    def test_unreachable_host_fails_every_recipient(self):
+        port = self.sink.port
+        self.sink.__exit__()
+        with override_settings(EMAIL_PORT=port, EMAIL_TIMEOUT=1):
+            failed = self.engine().send_each(
+                self.messages(['test@test.com', 'test2@test.com'])
+            )
+        self.assertEqual(list(failed), ['test@test.com', 'test2@test.com'])
+
+    def test_unexpected_worker_error_is_raised(self):
+        engine = self.engine(connections_per_host=2, queue_size=10)
+        with patch.object(
+            engine, 'open_connection', side_effect=TypeError('boom')
+        ):
+            with self.assertRaises(TypeError):
+                engine.send_each(self.messages(
+                    [f'test{idx}@test.com' for idx in range(50)]
+                ))
+
+    def test_missing_host_or_port_is_refused(self):
+        with override_settings(EMAIL_PORT=None):
+            with self.assertRaises(ImproperlyConfigured):
+                AsyncDeliveryEngine()
+        with override_settings(EMAIL_HOST=''):
+            with self.assertRaises(ImproperlyConfigured):
+                AsyncDeliveryEngine()
+
+    def test_engine_is_selected_by_setting(self):
+        with override_settings(EMAIL_DELIVERY_ENGINE='asyncio'):
+            self.assertIsInstance(delivery_engine(), AsyncDeliveryEngine)
+        self.assertIsInstance(delivery_engine(), ConnectionPool)
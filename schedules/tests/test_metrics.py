@@ -0,0 +1,155 @@
+import socket
+from datetime import timedelta
+
+from django.test import TestCase
+
+from mail_api.celery import app
+from schedules.tasks import task_send_email
+from utils import metrics
+from utils.metrics import Counter, Gauge, Histogram, Registry
+from utils.testing import serialize_input_data
+from utils.models import default_date_time
+
+
+class RegistryTest(TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_and_gauge_exposition(self):
+        counter = Counter(
+            'sends_total', 'Sends.', labelnames=('engine',),
+            registry=self.registry
+        )
+        gauge = Gauge('depth', 'Depth.', registry=self.registry)
+        counter.labels('pool').inc()
+        counter.labels('pool').inc(2)
+        counter.labels('asyncio').inc()
+        gauge.set(5)
+        gauge.dec()
+
+        self.assertEqual(self.registry.expose(), (
+            '# HELP sends_total Sends.\n'
+            '# TYPE sends_total counter\n'
+            'sends_total{engine="pool"} 3\n'
+            'sends_total{engine="asyncio"} 1\n'
+            '# HELP depth Depth.\n'
+            '# TYPE depth gauge\n'
+            'depth 4\n'
+        ))
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram(
+            'latency_seconds', 'Latency.', buckets=(0.1, 1),
+            registry=self.registry
+        )
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+
+        self.assertEqual(self.registry.expose().splitlines()[2:], [
+            'latency_seconds_bucket{le="0.1"} 2',
+            'latency_seconds_bucket{le="1.0"} 3',
+            'latency_seconds_bucket{le="+Inf"} 4',
+            'latency_seconds_sum 3.65',
+            'latency_seconds_count 4',
+        ])
+
+    def test_label_values_are_escaped(self):
+        counter = Counter(
+            'errors_total', 'Errors.', labelnames=('error',),
+            registry=self.registry
+        )
+        counter.labels('say "hi"\n\\').inc()
+        self.assertIn(
+            r'errors_total{error="say \"hi\"\n\\"} 1',
+            self.registry.expose()
+        )
+
+    def test_wrong_labels_and_duplicate_names_are_rejected(self):
+        counter = Counter(
+            'sends_total', 'Sends.', labelnames=('engine',),
+            registry=self.registry
+        )
+        with self.assertRaises(ValueError):
+            counter.labels()
+        with self.assertRaises(ValueError):
+            Gauge('sends_total', 'Sends.', registry=self.registry)
+
+
+class StatsdTest(TestCase):
+    def setUp(self):
+        self.collector = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.collector.bind(('127.0.0.1', 0))
+        self.collector.settimeout(1)
+        self.addCleanup(self.collector.close)
+        metrics.configure_statsd(
+            '127.0.0.1', self.collector.getsockname()[1], 'test'
+        )
+        self.addCleanup(metrics.configure_statsd, None)
+        self.registry = Registry()
+
+    def receive(self) -> str:
+        return self.collector.recv(512).decode()
+
+    def test_samples_are_sent_over_udp(self):
+        Counter(
+            'sends_total', 'Sends.', labelnames=('engine',),
+            registry=self.registry
+        ).labels('pool').inc(3)
+        Gauge('depth', 'Depth.', registry=self.registry).set(7)
+        Histogram(
+            'latency_seconds', 'Latency.', registry=self.registry
+        ).observe(0.25)
+
+        self.assertEqual(self.receive(), 'test.sends_total.pool:3|c')
+        self.assertEqual(self.receive(), 'test.depth:7|g')
+        self.assertEqual(self.receive(), 'test.latency_seconds:250.0|ms')
+
+    def test_unresolvable_host_drops_samples(self):
+        metrics.configure_statsd('statsd.invalid', 8125, 'test')
+        with self.assertLogs('utils.metrics', 'WARNING'):
+            Counter('sends_total', 'Sends.', registry=self.registry).inc()
+        metrics.configure_statsd(
+            '127.0.0.1', self.collector.getsockname()[1], 'test'
+        )
+        Gauge('depth', 'Depth.', registry=self.registry).set(1)
+        self.assertEqual(self.receive(), 'test.depth:1|g')
+
+    def test_unreachable_collector_is_ignored(self):
+        self.collector.close()
+        Counter('sends_total', 'Sends.', registry=self.registry).inc()
+
+
+class MetricsEndpointTest(TestCase):
+    def test_views_and_dispatcher_are_instrumented(self):
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+        serialize_input_data(
+            recipients=[{'name': 'test', 'email_address': 'test@gmail.com'}],
+            num_schedules=2, frequency=timedelta(hours=1),
+            end_date=default_date_time(days=5)
+        )
+        sent = metrics.EMAILS_SENT._default.value
+        self.client.get('/api/schedules/')
+        task_send_email()
+
+        self.assertEqual(metrics.DISPATCH_DUE._default.value, 2)
+        self.assertEqual(metrics.EMAILS_SENT._default.value, sent + 2)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Type'], metrics.PROMETHEUS_CONTENT_TYPE
+        )
+        body = response.content.decode()
+        self.assertIn(
+            'schedules_http_requests_total'
+            '{view="schedule_list",method="GET",status="200"}',
+            body
+        )
+        self.assertIn('schedules_recipient_upsert_duration_seconds', body)
+        # worker metrics only go to StatsD
+        self.assertNotIn('schedules_dispatch_duration_seconds', body)
+        self.assertNotIn('schedules_smtp_send_duration_seconds', body)
+        self.assertIn(
+            'schedules_dispatch_duration_seconds_count',
+            metrics.WORKER_REGISTRY.expose()
+        )
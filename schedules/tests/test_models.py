@@ -1,10 +1,10 @@
-from datetime import timedelta, date
+from datetime import timedelta, date, timezone as dt_timezone
 
 from django.test import TestCase
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
-from schedules.models import Schedule, Recipient, Interval
+from schedules.models import Schedule, Recipient, Interval, Content
 from utils.models import default_date_time
 
 
@@ -52,6 +52,22 @@ class ScheduleModelTest(TestCase):
             s2 = Schedule(start_date=start_date, end_date=end_date)
             s2.full_clean()
 
+    def test_fingerprint_ignores_time_zone_of_dates(self):
+        start_date = default_date_time()
+        end_date = default_date_time(days=1)
+        s1 = Schedule.objects.create(start_date=start_date, end_date=end_date)
+        offset = dt_timezone(timedelta(hours=-3))
+
+        s2 = Schedule(
+            start_date=start_date.astimezone(offset),
+            end_date=end_date.astimezone(offset)
+        )
+        with self.assertRaises(ValidationError):
+            s2.full_clean()
+        s2.description = "other"
+        s2.full_clean()
+        self.assertNotEqual(s2.fingerprint, s1.fingerprint)
+
     def test_stop_date_cannot_be_before_start_date(self):
         s1 = Schedule()
         s1.start_date = default_date_time()
@@ -105,6 +121,36 @@ class ScheduleModelTest(TestCase):
             s1.full_clean()
 
 
+class ContentModelTest(TestCase):
+    def test_schedules_with_the_same_text_share_content(self):
+        s1 = Schedule.objects.create(subject="hello", content="body")
+        s2 = Schedule.objects.create(
+            subject="hello", content="body", frequency=timedelta(hours=1)
+        )
+        self.assertEqual(s1.body_id, s2.body_id)
+        self.assertEqual(Content.objects.count(), 1)
+        self.assertEqual(Schedule.objects.get(pk=s2.pk).subject, "hello")
+
+    def test_changing_text_points_at_new_content(self):
+        s1 = Schedule.objects.create(subject="hello", content="body")
+        s2 = Schedule.objects.create(
+            subject="hello", content="body", frequency=timedelta(hours=1)
+        )
+        s2.content = "other body"
+        s2.save()
+
+        s1.refresh_from_db()
+        s2.refresh_from_db()
+        self.assertEqual(s1.content, "body")
+        self.assertEqual((s2.subject, s2.content), ("hello", "other body"))
+        self.assertNotEqual(s1.body_id, s2.body_id)
+
+    def test_subject_and_content_are_not_ambiguous(self):
+        s1 = Schedule.objects.create(subject="ab", content="c")
+        s2 = Schedule.objects.create(subject="a", content="bc")
+        self.assertNotEqual(s1.body_id, s2.body_id)
+
+
 class RecipientModelTest(TestCase):
     def test_default_recipient_values(self):
         r1 = Recipient()
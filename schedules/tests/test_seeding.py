@@ -0,0 +1,100 @@
+import io
+import random
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase
+
+from schedules.models import Schedule, Recipient, Interval
+from utils.seeding import seed_schedules, fanout_sampler, FANOUT_UNIFORM,\
+    FANOUT_PARETO, FANOUT_MAX_FACTOR
+
+
+def dataset():
+    return (
+        list(Schedule.objects.values_list(
+            'id', 'body__content', 'frequency', 'start_date', 'next_run_at'
+        )),
+        list(Schedule.recipients.through.objects.values_list(
+            'schedule_id', 'recipient_id'
+        ).order_by('schedule_id', 'recipient_id')),
+        list(Recipient.objects.values_list('id', 'email_address'))
+    )
+
+
+class SeedSchedulesTest(TestCase):
+    def test_seeding_is_deterministic(self):
+        seed_schedules(25, recipients=10, fanout=3, seed=1, chunk_size=10)
+        first = dataset()
+        Schedule.objects.all().delete()
+        Recipient.objects.all().delete()
+        seed_schedules(25, recipients=10, fanout=3, seed=1, chunk_size=10)
+
+        self.assertEqual(dataset(), first)
+        seeded, memberships, recipients = first
+        self.assertEqual(len(seeded), 25)
+        self.assertEqual(len(memberships), 75)
+        self.assertEqual(len(recipients), 10)
+        self.assertEqual(Interval.objects.count(), 3)
+
+    def test_recipients_of_a_seed_are_reused(self):
+        seed_schedules(5, recipients=10, fanout=2, seed=1)
+        seed_schedules(5, recipients=15, fanout=2, seed=1)
+        seed_schedules(5, recipients=10, fanout=2, seed=2)
+
+        self.assertEqual(Schedule.objects.count(), 15)
+        self.assertEqual(Recipient.objects.count(), 25)
+        recipient_ids = set(Recipient.objects.values_list('pk', flat=True))
+        self.assertTrue(set(
+            Schedule.recipients.through.objects.values_list(
+                'recipient_id', flat=True
+            )
+        ) <= recipient_ids)
+
+    def test_seeded_schedules_work_with_the_orm(self):
+        seed_schedules(3, recipients=5, fanout=2)
+        schedule = Schedule.objects.get(pk=2)
+        self.assertEqual(schedule.next_run_at, schedule.start_date)
+        self.assertEqual(schedule.recipients.count(), 2)
+        created = Recipient.objects.create(email_address='new@example.com')
+        self.assertGreater(created.pk, 5)
+
+    def test_fanout_distributions_stay_in_bounds(self):
+        rng = random.Random(0)
+        for distribution in (FANOUT_UNIFORM, FANOUT_PARETO):
+            sample = fanout_sampler(rng, distribution, 2, 40)
+            fanouts = [sample() for _ in range(1000)]
+            self.assertEqual(min(fanouts), 2)
+            self.assertEqual(max(fanouts), 40)
+
+    def test_distribution_without_fanout_max_varies(self):
+        seed_schedules(
+            50, recipients=30, fanout=2, distribution=FANOUT_UNIFORM, seed=1
+        )
+        fanouts = set(
+            Schedule.objects.annotate(
+                fanout=Count('recipients')
+            ).values_list('fanout', flat=True)
+        )
+        self.assertGreater(len(fanouts), 1)
+        self.assertLessEqual(max(fanouts), 2 * FANOUT_MAX_FACTOR)
+
+    def test_command(self):
+        call_command(
+            'seed_schedules', '20', '--recipients', '8', '--fanout', '1',
+            '--fanout-max', '4', '--distribution', 'uniform',
+            stdout=io.StringIO()
+        )
+        self.assertEqual(Schedule.objects.count(), 20)
+        self.assertEqual(Recipient.objects.count(), 8)
+
+    @skipUnless(connection.vendor == 'postgresql', "COPY needs PostgreSQL")
+    def test_copy_matches_inserts(self):
+        seed_schedules(25, recipients=10, fanout=3, seed=1, use_copy=False)
+        inserted = dataset()
+        Schedule.objects.all().delete()
+        Recipient.objects.all().delete()
+        seed_schedules(25, recipients=10, fanout=3, seed=1, use_copy=True)
+        self.assertEqual(dataset()[0], inserted[0])
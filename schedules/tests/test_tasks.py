@@ -0,0 +1,336 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from celery.exceptions import Retry
+from django.conf import settings
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from schedules.models import Schedule, Delivery
+from mail_api.celery import app
+from schedules.tasks import task_send_email, send_email_to_schedule
+from utils.tasks import load_content
+from utils.testing import serialize_input_data
+from utils.models import default_date_time
+
+
+class TaskSendEmailTest(TestCase):
+    def setUp(self):
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+        load_content.cache_clear()
+        self.recipients = [
+            {'name': 'test', 'email_address': 'test@gmail.com'},
+            {'name': 'test2', 'email_address': 'test2@test.com'}
+        ]
+
+    def create_schedules(self, num_schedules=1, **kwargs):
+        kwargs.setdefault('frequency', timedelta(hours=1))
+        kwargs.setdefault('end_date', default_date_time(days=5))
+        serialize_input_data(
+            recipients=self.recipients, num_schedules=num_schedules,
+            **kwargs
+        )
+
+    def test_new_schedule_next_run_at_is_start_date(self):
+        self.create_schedules()
+        schedule = Schedule.objects.first()
+        self.assertEqual(schedule.next_run_at, schedule.start_date)
+
+    def test_due_schedules_are_sent_and_advanced(self):
+        self.create_schedules(num_schedules=2)
+        schedule = Schedule.objects.first()
+        now = timezone.now()
+
+        task_send_email()
+
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertEqual(
+            sorted(message.to for message in mail.outbox[:2]),
+            [['test2@test.com'], ['test@gmail.com']]
+        )
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.status, Schedule.ACTIVE)
+        self.assertGreater(schedule.next_run_at, now)
+        self.assertLessEqual(
+            schedule.next_run_at, now + schedule.frequency
+        )
+        self.assertEqual(
+            (schedule.next_run_at - schedule.start_date) % schedule.frequency,
+            timedelta(0)
+        )
+
+    def test_schedules_not_due_are_not_sent(self):
+        self.create_schedules(
+            start_date=default_date_time(days=1),
+            end_date=default_date_time(days=5)
+        )
+        task_send_email()
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_paused_schedules_are_not_sent(self):
+        self.create_schedules()
+        Schedule.objects.update(status=Schedule.PAUSED)
+        task_send_email()
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_tick_restricted_to_interval(self):
+        self.create_schedules()
+        self.create_schedules(content="daily", frequency=timedelta(days=1))
+
+        task_send_email(timedelta(days=1).total_seconds())
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].body, "daily: 0")
+
+    def test_schedule_is_sent_once_per_run(self):
+        self.create_schedules()
+        task_send_email()
+        task_send_email()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertGreater(
+            Schedule.objects.first().next_run_at, timezone.now()
+        )
+
+    def test_schedule_started_before_today_is_activated(self):
+        self.create_schedules()
+        started = timezone.now() - timedelta(days=2)
+        Schedule.objects.update(start_date=started, next_run_at=started)
+
+        task_send_email()
+
+        schedule = Schedule.objects.first()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(schedule.status, Schedule.ACTIVE)
+
+    def test_schedule_is_completed_after_last_run(self):
+        self.create_schedules(frequency=timedelta(days=1))
+        Schedule.objects.update(end_date=timezone.now() + timedelta(hours=1))
+        task_send_email()
+
+        schedule = Schedule.objects.first()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(schedule.status, Schedule.COMPLETED)
+
+        Schedule.objects.update(next_run_at=timezone.now())
+        task_send_email()
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_tick_query_count_does_not_grow_with_table(self):
+        self.create_schedules(num_schedules=2)
+        self.create_schedules(
+            content="future", num_schedules=20,
+            start_date=default_date_time(days=1)
+        )
+        # the first tick also records the NOT_ADDED -> ACTIVE changes, so
+        # only the ticks after it are compared
+        task_send_email()
+        Schedule.objects.filter(status=Schedule.ACTIVE).update(
+            next_run_at=timezone.now()
+        )
+        load_content.cache_clear()
+        with CaptureQueriesContext(connection) as queries:
+            task_send_email()
+        self.assertEqual(len(mail.outbox), 8)
+
+        self.create_schedules(
+            content="more future", num_schedules=40,
+            start_date=default_date_time(days=1)
+        )
+        Schedule.objects.filter(status=Schedule.ACTIVE).update(
+            next_run_at=timezone.now()
+        )
+        load_content.cache_clear()
+        with CaptureQueriesContext(connection) as more_queries:
+            task_send_email()
+        self.assertEqual(len(mail.outbox), 12)
+        self.assertEqual(len(queries), len(more_queries))
+
+    def test_dispatcher_enqueues_schedule_ids_and_run_times(self):
+        self.create_schedules(num_schedules=2)
+        with patch.object(send_email_to_schedule, 'delay') as delay:
+            task_send_email()
+        self.assertEqual(
+            sorted(call.args for call in delay.call_args_list),
+            [
+                (pk, start_date.isoformat())
+                for pk, start_date in Schedule.objects.values_list(
+                    'pk', 'start_date'
+                )
+            ]
+        )
+
+    def test_send_email_to_schedule_by_id(self):
+        self.create_schedules()
+        schedule = Schedule.objects.first()
+        Schedule.objects.update(status=Schedule.ACTIVE)
+
+        with self.assertNumQueries(3):
+            sent = send_email_to_schedule(schedule.pk)
+        self.assertEqual(sent, {'sent': 2, 'failed': {}})
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_shared_content_is_loaded_once(self):
+        self.create_schedules(description="one", content="shared")
+        self.create_schedules(description="two", content="shared")
+        Schedule.objects.update(status=Schedule.ACTIVE)
+        first, second = Schedule.objects.all()
+        self.assertEqual(first.body_id, second.body_id)
+
+        send_email_to_schedule(first.pk)
+        with self.assertNumQueries(2):
+            send_email_to_schedule(second.pk)
+        self.assertEqual(
+            [message.body for message in mail.outbox], ["shared: 0"] * 4
+        )
+
+    def test_send_email_skips_paused_or_deleted_schedules(self):
+        self.create_schedules()
+        schedule = Schedule.objects.first()
+        Schedule.objects.update(status=Schedule.PAUSED)
+
+        nothing_sent = {'sent': 0, 'failed': {}}
+        self.assertEqual(send_email_to_schedule(schedule.pk), nothing_sent)
+        self.assertEqual(
+            send_email_to_schedule(schedule.pk + 1), nothing_sent
+        )
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_run_is_recorded_in_delivery_ledger(self):
+        self.create_schedules()
+        schedule = Schedule.objects.first()
+        task_send_email()
+
+        self.assertEqual(
+            sorted(Delivery.objects.values_list(
+                'schedule_id', 'scheduled_run_at', 'recipient__email_address'
+            )),
+            [
+                (schedule.pk, schedule.start_date, 'test2@test.com'),
+                (schedule.pk, schedule.start_date, 'test@gmail.com')
+            ]
+        )
+
+    def test_redelivered_run_skips_delivered_recipients(self):
+        self.create_schedules()
+        schedule = Schedule.objects.first()
+        run_at = schedule.start_date.isoformat()
+        Delivery.objects.create(
+            schedule=schedule, scheduled_run_at=schedule.start_date,
+            recipient=schedule.recipients.get(email_address='test@gmail.com')
+        )
+
+        sent = send_email_to_schedule(schedule.pk, run_at)
+        self.assertEqual(sent, {'sent': 1, 'failed': {}})
+        self.assertEqual(mail.outbox[0].to, ['test2@test.com'])
+
+        sent = send_email_to_schedule(schedule.pk, run_at)
+        self.assertEqual(sent, {'sent': 0, 'failed': {}})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(Delivery.objects.count(), 2)
+
+    def test_next_run_is_sent_again(self):
+        self.create_schedules()
+        schedule = Schedule.objects.first()
+        send_email_to_schedule(schedule.pk, schedule.start_date.isoformat())
+        send_email_to_schedule(
+            schedule.pk,
+            (schedule.start_date + schedule.frequency).isoformat()
+        )
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertEqual(Delivery.objects.count(), 4)
+
+    def test_recipients_claimed_by_an_overlapping_send_are_skipped(self):
+        self.create_schedules()
+        schedule = Schedule.objects.first()
+        Delivery.objects.create(
+            schedule=schedule, scheduled_run_at=schedule.start_date,
+            recipient=schedule.recipients.get(email_address='test@gmail.com'),
+            claim='other', delivered_at=None
+        )
+
+        with self.assertRaises(Retry):
+            send_email_to_schedule(
+                schedule.pk, schedule.start_date.isoformat()
+            )
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['test2@test.com'])
+        self.assertEqual(Delivery.objects.filter(
+            delivered_at__isnull=True
+        ).get().claim, 'other')
+
+    def test_retry_waits_for_the_claims_of_another_send(self):
+        self.create_schedules()
+        schedule = Schedule.objects.first()
+        Delivery.objects.create(
+            schedule=schedule, scheduled_run_at=schedule.start_date,
+            recipient=schedule.recipients.get(email_address='test@gmail.com'),
+            claim='other', delivered_at=None
+        )
+        with patch.object(
+            send_email_to_schedule, 'retry', side_effect=Retry
+        ) as retry:
+            with self.assertRaises(Retry):
+                send_email_to_schedule(
+                    schedule.pk, schedule.start_date.isoformat()
+                )
+        countdown = retry.call_args.kwargs['countdown']
+        self.assertGreater(countdown, 0)
+        self.assertLessEqual(
+            countdown, settings.EMAIL_DELIVERY_CLAIM_TIMEOUT
+        )
+
+    def test_redelivered_task_takes_its_claims_back(self):
+        self.create_schedules()
+        schedule = Schedule.objects.first()
+        run_at = schedule.start_date
+        Delivery.objects.bulk_create([
+            Delivery(
+                schedule=schedule, scheduled_run_at=run_at,
+                recipient=recipient, claim='dead-send', delivered_at=None
+            )
+            for recipient in schedule.recipients.all()
+        ])
+
+        result = send_email_to_schedule.apply(
+            (schedule.pk, run_at.isoformat()), task_id='dead-send'
+        ).get()
+        self.assertEqual(result, {'sent': 2, 'failed': {}})
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(
+            Delivery.objects.filter(delivered_at__isnull=True).exists()
+        )
+
+    def test_claims_of_a_dead_send_are_taken_over(self):
+        self.create_schedules()
+        schedule = Schedule.objects.first()
+        Delivery.objects.create(
+            schedule=schedule, scheduled_run_at=schedule.start_date,
+            recipient=schedule.recipients.get(email_address='test@gmail.com'),
+            claim='other', delivered_at=None,
+            claimed_at=timezone.now() - timedelta(
+                seconds=settings.EMAIL_DELIVERY_CLAIM_TIMEOUT + 1
+            )
+        )
+
+        sent = send_email_to_schedule(
+            schedule.pk, schedule.start_date.isoformat()
+        )
+        self.assertEqual(sent, {'sent': 2, 'failed': {}})
+        self.assertFalse(
+            Delivery.objects.filter(delivered_at__isnull=True).exists()
+        )
+
+    @override_settings(EMAIL_DELIVERY_LEDGER_BATCH_SIZE=1)
+    def test_ledger_is_written_per_batch(self):
+        self.create_schedules()
+        schedule = Schedule.objects.first()
+        with self.assertNumQueries(8):
+            sent = send_email_to_schedule(
+                schedule.pk, schedule.start_date.isoformat()
+            )
+        self.assertEqual(sent, {'sent': 2, 'failed': {}})
+        self.assertEqual(Delivery.objects.count(), 2)
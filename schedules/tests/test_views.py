@@ -1,16 +1,27 @@
+import time
 from unittest import skip
+from unittest.mock import patch
 from datetime import timedelta
 from io import BytesIO
 
-from django.test import TestCase
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import resolve
 from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 
 
+from schedules.checks import check_shared_cache
 from schedules.views import schedule_list, schedule_one
-from schedules.serializers import ScheduleSerializer
-from schedules.models import Schedule, Recipient
+from schedules.serializers import ScheduleSerializer, SCHEDULE_SPARSE_FIELDS
+from schedules.models import Schedule, Recipient, Interval
 
+from mail_api.celery import app
+from schedules.tasks import task_send_email
+from utils.models import default_date_time
+from utils.validators import FIELDS_NOT_UNIQUE_TOGETHER_ERROR
 from utils.testing import create_schedule_input_data, serialize_input_data
 
 
@@ -34,8 +45,76 @@ class ScheduleViewTest(TestCase):
         response_json = JSONParser().parse(bytes_stream)
 
         self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response_json['results']), num_schedules)
+        self.assertIsNone(response_json['next'])
+
+    def test_get_schedule_list_is_paginated_by_cursor(self):
+        serialize_input_data(num_schedules=5)
+
+        response = self.client.get(self.schedule_base_url, {'page_size': 2})
+        first_page = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(first_page['results']), 2)
+        self.assertIsNotNone(first_page['next'])
+
+        contents = [s['content'] for s in first_page['results']]
+        cursor = first_page['next']
+        while cursor:
+            response = self.client.get(
+                self.schedule_base_url, {'page_size': 2, 'cursor': cursor}
+            )
+            page = response.json()
+            contents += [s['content'] for s in page['results']]
+            cursor = page['next']
+
+        self.assertEqual(
+            contents,
+            [s.content for s in Schedule.objects.order_by('pk')]
+        )
+
+    def test_get_schedule_list_with_invalid_cursor(self):
+        response = self.client.get(
+            self.schedule_base_url, {'cursor': 'not-a-cursor'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(self.schedule_base_url, {'page_size': 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_stream_schedule_list(self):
+        num_schedules = 5
+        serialize_input_data(num_schedules=num_schedules)
+
+        response = self.client.get(self.schedule_base_url, {'stream': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        stream = BytesIO(b''.join(response.streaming_content))
+        response_json = JSONParser().parse(stream)
         self.assertEqual(len(response_json), num_schedules)
 
+    def test_get_schedule_list_query_count_is_constant(self):
+        serialize_input_data(recipients=self.recipients, num_schedules=2)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.schedule_base_url)
+        self.assertEqual(len(response.json()['results']), 2)
+
+        serialize_input_data(
+            content="more", recipients=self.recipients, num_schedules=20
+        )
+        with self.assertNumQueries(3):
+            response = self.client.get(self.schedule_base_url)
+        results = response.json()['results']
+        self.assertEqual(len(results), 22)
+        self.assertEqual(len(results[-1]['recipients']), 2)
+
+    def test_get_schedule_query_count(self):
+        serialize_input_data(recipients=self.recipients)
+        pk = Schedule.objects.first().pk
+        with self.assertNumQueries(2):
+            response = self.client.get(f'{self.schedule_base_url}{pk}/')
+        self.assertEqual(len(response.json()['recipients']), 2)
+
     def test_post_new_schedule(self):
         recipients = self.recipients
         data = create_schedule_input_data(recipients=recipients)
@@ -105,3 +184,724 @@ class ScheduleViewTest(TestCase):
         self.assertEqual(
             len(Schedule.recipients.through.objects.all()), 0
         )
+
+
+class ScheduleBulkViewTest(TestCase):
+    def setUp(self):
+        self.bulk_url = "/api/schedules/bulk/"
+        self.recipients = [
+            {'name': 'test', 'email_address': 'test@gmail.com'},
+            {'name': 'test2', 'email_address': 'test2@test.com'}
+        ]
+
+    def bulk_data(self, num_schedules):
+        return [
+            create_schedule_input_data(
+                content=f"placeholder: {num}", recipients=self.recipients
+            )
+            for num in range(num_schedules)
+        ]
+
+    def test_bulk_create_schedules(self):
+        response = self.client.post(
+            path=self.bulk_url,
+            data=self.bulk_data(3),
+            content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 201)
+
+        ids = [result['id'] for result in response.json()]
+        self.assertEqual(
+            ids, list(Schedule.objects.values_list('id', flat=True))
+        )
+        self.assertEqual(Recipient.objects.count(), 2)
+        self.assertEqual(Schedule.recipients.through.objects.count(), 6)
+        for schedule in Schedule.objects.all():
+            self.assertEqual(schedule.recipients.count(), 2)
+
+    def test_bulk_create_accepts_ndjson(self):
+        body = "\n".join(
+            JSONRenderer().render(item).decode()
+            for item in self.bulk_data(2)
+        )
+        response = self.client.post(
+            path=self.bulk_url,
+            data=body,
+            content_type="application/x-ndjson"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Schedule.objects.count(), 2)
+
+    def test_bulk_create_reports_errors_per_item(self):
+        serialize_input_data(content="placeholder", num_schedules=1)
+        data = self.bulk_data(3)
+        data.append(data[1])
+
+        response = self.client.post(
+            path=self.bulk_url,
+            data=data,
+            content_type="application/json"
+        )
+        errors = response.json()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(errors), 4)
+        self.assertIn('non_field_errors', errors[0])
+        self.assertEqual(errors[1], {})
+        self.assertEqual(errors[2], {})
+        self.assertIn('non_field_errors', errors[3])
+        self.assertEqual(Schedule.objects.count(), 1)
+
+    def test_bulk_create_query_count_does_not_grow(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(
+                path=self.bulk_url,
+                data=self.bulk_data(2),
+                content_type="application/json"
+            )
+        Schedule.objects.all().delete()
+        Recipient.objects.all().delete()
+        Interval.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(
+                path=self.bulk_url,
+                data=self.bulk_data(50),
+                content_type="application/json"
+            )
+        self.assertEqual(Schedule.objects.count(), 50)
+        self.assertEqual(len(small), len(large))
+
+    def test_bulk_create_rejects_non_list_payload(self):
+        response = self.client.post(
+            path=self.bulk_url,
+            data=create_schedule_input_data(recipients=self.recipients),
+            content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Schedule.objects.count(), 0)
+
+
+class ScheduleDetailCacheTest(TestCase):
+    def setUp(self):
+        self.schedule_base_url = "/api/schedules/"
+        self.recipients = [
+            {'name': 'test', 'email_address': 'test@gmail.com'}
+        ]
+        serialize_input_data(recipients=self.recipients)
+        self.schedule = Schedule.objects.first()
+        self.url = f'{self.schedule_base_url}{self.schedule.pk}/'
+
+    def test_second_get_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.json()['id'], self.schedule.pk)
+
+    def test_matching_etag_gets_304_without_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_put_invalidates(self):
+        etag = self.client.get(self.url)['ETag']
+        data = create_schedule_input_data(
+            content="new content", recipients=self.recipients
+        )
+        self.client.put(self.url, data, content_type="application/json")
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['content'], "new content")
+
+    def test_recipient_change_invalidates(self):
+        self.client.get(self.url)
+        self.client.patch(
+            self.url,
+            {'recipients': [
+                {'name': 'other', 'email_address': 'other@test.com'}
+            ]},
+            content_type="application/json"
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(
+            [recipient['email_address']
+             for recipient in response.json()['recipients']],
+            ['other@test.com']
+        )
+
+    def test_delete_invalidates(self):
+        self.client.get(self.url)
+        self.client.delete(self.url)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_dispatcher_invalidates(self):
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+        self.assertEqual(
+            self.client.get(self.url).json()['status'], Schedule.NOT_ADDED
+        )
+        task_send_email()
+        self.assertEqual(
+            self.client.get(self.url).json()['status'], Schedule.ACTIVE
+        )
+
+    def test_missed_invalidation_expires(self):
+        etag = self.client.get(self.url)['ETag']
+        # written by a process whose invalidation this cache never saw
+        Schedule.objects.filter(pk=self.schedule.pk).update(
+            description="changed elsewhere"
+        )
+        expired = time.time() + settings.SCHEDULES_CACHE_TIMEOUT + 1
+        with patch('django.core.cache.backends.locmem.time.time',
+                   return_value=expired):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['description'], "changed elsewhere")
+
+    def test_locmem_cache_is_flagged_for_deploys(self):
+        self.assertEqual(
+            [warning.id for warning in check_shared_cache(None)],
+            ['schedules.W001']
+        )
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+        }}):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class ScheduleListConditionalGetTest(TestCase):
+    def setUp(self):
+        self.schedule_base_url = "/api/schedules/"
+        self.recipients = [
+            {'name': 'test', 'email_address': 'test@gmail.com'}
+        ]
+        serialize_input_data(recipients=self.recipients, num_schedules=2)
+        self.schedule = Schedule.objects.first()
+        self.url = f'{self.schedule_base_url}{self.schedule.pk}/'
+
+    def assertListChanged(self, etag):
+        response = self.client.get(
+            self.schedule_base_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_matching_etag_gets_304_with_one_query(self):
+        response = self.client.get(self.schedule_base_url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.schedule_base_url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.schedule_base_url)[
+            'Last-Modified'
+        ]
+        response = self.client.get(
+            self.schedule_base_url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_query_string(self):
+        first = self.client.get(self.schedule_base_url, {'page_size': 1})
+        second = self.client.get(
+            self.schedule_base_url, {'page_size': 1, 'cursor': first.json()[
+                'next'
+            ]}
+        )
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        response = self.client.get(
+            self.schedule_base_url, {'page_size': 1},
+            HTTP_IF_NONE_MATCH=second['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_stream_has_etag(self):
+        etag = self.client.get(
+            self.schedule_base_url, {'stream': 'true'}
+        )['ETag']
+        response = self.client.get(
+            self.schedule_base_url, {'stream': 'true'},
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_create_changes_etag(self):
+        etag = self.client.get(self.schedule_base_url)['ETag']
+        self.client.post(
+            self.schedule_base_url,
+            create_schedule_input_data(
+                content="new", recipients=self.recipients
+            ),
+            content_type="application/json"
+        )
+        self.assertListChanged(etag)
+
+    def test_put_changes_etag(self):
+        etag = self.client.get(self.schedule_base_url)['ETag']
+        self.client.put(
+            self.url,
+            create_schedule_input_data(
+                content="new content", recipients=self.recipients
+            ),
+            content_type="application/json"
+        )
+        self.assertListChanged(etag)
+
+    def test_delete_changes_etag(self):
+        etag = self.client.get(self.schedule_base_url)['ETag']
+        self.client.delete(self.url)
+        self.assertListChanged(etag)
+
+    def test_recipient_change_changes_etag(self):
+        etag = self.client.get(self.schedule_base_url)['ETag']
+        self.client.patch(
+            self.url,
+            {'recipients': [
+                {'name': 'other', 'email_address': 'other@test.com'}
+            ]},
+            content_type="application/json"
+        )
+        self.assertListChanged(etag)
+
+    def test_dispatcher_changes_etag(self):
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+        etag = self.client.get(self.schedule_base_url)['ETag']
+        task_send_email()
+        self.assertListChanged(etag)
+
+    def test_dispatcher_keeps_etag_of_active_schedules(self):
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+        task_send_email()
+        Schedule.objects.update(
+            next_run_at=default_date_time(),
+            end_date=default_date_time(days=10)
+        )
+        etag = self.client.get(self.schedule_base_url)['ETag']
+        task_send_email()
+        response = self.client.get(
+            self.schedule_base_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class ScheduleChangesViewTest(TestCase):
+    def setUp(self):
+        self.schedule_base_url = "/api/schedules/"
+        self.changes_url = "/api/schedules/changes/"
+        self.recipients = [
+            {'name': 'test', 'email_address': 'test@gmail.com'}
+        ]
+        serialize_input_data(recipients=self.recipients, num_schedules=3)
+
+    def sync(self, since=None, **params):
+        if since:
+            params['since'] = since
+        response = self.client.get(self.changes_url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_writes_bump_the_change_counter_once(self):
+        data = create_schedule_input_data(
+            content="counted", recipients=self.recipients
+        )
+        for method, url in (
+            (self.client.post, self.schedule_base_url),
+            (self.client.put, f'{self.schedule_base_url}'
+                              f'{Schedule.objects.first().pk}/'),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                response = method(url, data, content_type="application/json")
+            self.assertIn(response.status_code, (200, 201))
+            self.assertEqual(len([
+                query for query in queries if query['sql'].startswith(
+                    'UPDATE "schedules_changecounter"'
+                )
+            ]), 1)
+            data = dict(data, content="counted again")
+
+    def test_without_token_returns_everything(self):
+        page = self.sync()
+        self.assertEqual(
+            [schedule['id'] for schedule in page['changes']],
+            list(Schedule.objects.values_list('pk', flat=True))
+        )
+        self.assertEqual(page['deleted'], [])
+        self.assertFalse(page['more'])
+        self.assertEqual(self.sync(page['next'])['changes'], [])
+
+    def test_returns_only_changes_after_token(self):
+        token = self.sync()['next']
+        schedule = Schedule.objects.first()
+        self.client.put(
+            f'{self.schedule_base_url}{schedule.pk}/',
+            create_schedule_input_data(
+                content="new content", recipients=self.recipients
+            ),
+            content_type="application/json"
+        )
+
+        page = self.sync(token)
+        self.assertEqual(len(page['changes']), 1)
+        self.assertEqual(page['changes'][0]['id'], schedule.pk)
+        self.assertEqual(page['changes'][0]['content'], "new content")
+        self.assertEqual(self.sync(page['next'])['changes'], [])
+
+    def test_delete_leaves_tombstone(self):
+        token = self.sync()['next']
+        schedule = Schedule.objects.first()
+        self.client.delete(f'{self.schedule_base_url}{schedule.pk}/')
+
+        page = self.sync(token)
+        self.assertEqual(page['changes'], [])
+        self.assertEqual(page['deleted'], [schedule.pk])
+
+    def test_pages_through_changes_and_tombstones_in_order(self):
+        token = self.sync()['next']
+        first, second, third = Schedule.objects.all()
+        self.client.delete(f'{self.schedule_base_url}{second.pk}/')
+        self.client.patch(
+            f'{self.schedule_base_url}{third.pk}/',
+            {'recipients': [
+                {'name': 'other', 'email_address': 'other@test.com'}
+            ]},
+            content_type="application/json"
+        )
+        self.client.delete(f'{self.schedule_base_url}{first.pk}/')
+
+        changes, deleted, more = [], [], True
+        while more:
+            page = self.sync(token, page_size=1)
+            changes += [schedule['id'] for schedule in page['changes']]
+            deleted += page['deleted']
+            token, more = page['next'], page['more']
+        self.assertEqual(changes, [third.pk])
+        self.assertEqual(deleted, [second.pk, first.pk])
+
+    def test_query_count_is_constant(self):
+        with self.assertNumQueries(3):
+            self.sync()
+
+    def test_invalid_token(self):
+        response = self.client.get(self.changes_url, {'since': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ScheduleListFilterTest(TestCase):
+    def setUp(self):
+        self.schedule_base_url = "/api/schedules/"
+        self.recipients = [
+            {'name': 'test', 'email_address': 'test@gmail.com'}
+        ]
+        serialize_input_data(recipients=self.recipients, num_schedules=2)
+        serialize_input_data(
+            content="weekly", frequency=timedelta(weeks=1),
+            start_date=default_date_time(days=2),
+            end_date=default_date_time(days=30),
+            recipients=self.recipients, num_schedules=2
+        )
+        self.weekly = list(
+            Schedule.objects.filter(frequency=timedelta(weeks=1))
+        )
+        Schedule.objects.filter(pk=self.weekly[0].pk).update(
+            status=Schedule.ACTIVE
+        )
+
+    def get_ids(self, **params):
+        response = self.client.get(self.schedule_base_url, params)
+        self.assertEqual(response.status_code, 200)
+        return [schedule['id'] for schedule in response.json()['results']]
+
+    def test_sparse_fields_cover_the_serializer(self):
+        self.assertEqual(
+            set(SCHEDULE_SPARSE_FIELDS), set(ScheduleSerializer().fields)
+        )
+
+    def test_filter_by_status(self):
+        self.assertEqual(self.get_ids(status='AC'), [self.weekly[0].pk])
+        self.assertEqual(len(self.get_ids(status='AC,NA')), 4)
+
+    def test_filter_by_frequency(self):
+        self.assertEqual(
+            self.get_ids(frequency='7 00:00:00'),
+            [schedule.pk for schedule in self.weekly]
+        )
+
+    def test_filter_by_date_range(self):
+        after = default_date_time(days=1).isoformat()
+        self.assertEqual(
+            self.get_ids(start_date_after=after),
+            [schedule.pk for schedule in self.weekly]
+        )
+        self.assertEqual(len(self.get_ids(start_date_before=after)), 2)
+        self.assertEqual(
+            self.get_ids(
+                end_date_after=default_date_time(days=29).isoformat(),
+                status='NA'
+            ),
+            [self.weekly[1].pk]
+        )
+
+    def test_invalid_filters(self):
+        for params in (
+            {'status': 'XX'}, {'frequency': 'weekly'},
+            {'start_date_after': 'tomorrow'}, {'fields': 'id,secret'}
+        ):
+            response = self.client.get(self.schedule_base_url, params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_sparse_fieldset_skips_recipients(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                self.schedule_base_url, {'fields': 'id,subject'}
+            )
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"content"', queries[-1]['sql'])
+        self.assertEqual(
+            response.json()['results'][0],
+            {'id': Schedule.objects.first().pk, 'subject': 'placeholder'}
+        )
+
+    def test_sparse_fieldset_with_recipients(self):
+        response = self.client.get(
+            self.schedule_base_url, {'fields': 'id,recipients'}
+        )
+        result = response.json()['results'][0]
+        self.assertEqual(set(result), {'id', 'recipients'})
+        self.assertEqual(len(result['recipients']), 1)
+
+    def test_stream_with_filters_and_fields(self):
+        response = self.client.get(
+            self.schedule_base_url,
+            {'stream': 'true', 'status': 'AC', 'fields': 'id'}
+        )
+        self.assertEqual(
+            JSONParser().parse(BytesIO(b''.join(response.streaming_content))),
+            [{'id': self.weekly[0].pk}]
+        )
+
+
+class SchedulePatchTest(TestCase):
+    def setUp(self):
+        self.schedule_base_url = "/api/schedules/"
+        self.recipients = [
+            {'name': 'test', 'email_address': 'test@gmail.com'}
+        ]
+        serialize_input_data(recipients=self.recipients, num_schedules=2)
+        self.schedule = Schedule.objects.first()
+        self.url = f'{self.schedule_base_url}{self.schedule.pk}/'
+
+    def patch(self, data, url=None):
+        return self.client.patch(
+            url or self.url, data, content_type="application/json"
+        )
+
+    def test_patch_status_writes_only_status(self):
+        serializer = ScheduleSerializer(
+            instance=Schedule.objects.get(pk=self.schedule.pk),
+            data={'status': Schedule.PAUSED}, partial=True
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(serializer.is_valid())
+            serializer.save()
+
+        sql = [query['sql'] for query in queries]
+        self.assertFalse([
+            query for query in sql
+            if 'schedules_content' in query or 'recipient' in query
+        ])
+        update, = [query for query in sql if query.startswith(
+            'UPDATE "schedules_schedule" SET "status"'
+        )]
+        self.assertNotIn('"description"', update)
+        self.assertEqual(
+            Schedule.objects.get(pk=self.schedule.pk).status,
+            Schedule.PAUSED
+        )
+
+    def test_patch_schedule_that_already_started(self):
+        started = default_date_time(days=1, subtract=True)
+        Schedule.objects.filter(pk=self.schedule.pk).update(
+            start_date=started
+        )
+        response = self.patch({'status': Schedule.PAUSED})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], Schedule.PAUSED)
+        self.assertEqual(
+            Schedule.objects.get(pk=self.schedule.pk).start_date, started
+        )
+
+    def test_patch_checks_date_invariants_against_stored_values(self):
+        response = self.patch({
+            'end_date': (self.schedule.start_date - timedelta(days=1))
+            .isoformat()
+        })
+        self.assertEqual(response.status_code, 400)
+        response = self.patch({'frequency': '7 00:00:00'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_patch_text(self):
+        response = self.patch({'subject': "patched"})
+        self.assertEqual(response.status_code, 200)
+        schedule = Schedule.objects.get(pk=self.schedule.pk)
+        self.assertEqual(
+            (schedule.subject, schedule.content),
+            ("patched", self.schedule.content)
+        )
+        self.assertNotEqual(schedule.fingerprint, self.schedule.fingerprint)
+
+    def test_patch_into_a_duplicate_is_rejected(self):
+        other = Schedule.objects.last()
+        response = self.patch({'content': other.content})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()['non_field_errors'],
+            [FIELDS_NOT_UNIQUE_TOGETHER_ERROR]
+        )
+
+    def test_patch_recipients(self):
+        response = self.patch({
+            'recipients': [{'name': 'new', 'email_address': 'new@test.com'}]
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(self.schedule.recipients.values_list(
+                'email_address', flat=True
+            )),
+            ['new@test.com']
+        )
+
+
+class ScheduleBulkStatusTest(TestCase):
+    def setUp(self):
+        self.url = "/api/schedules/bulk-status/"
+        serialize_input_data(
+            recipients=[{'name': 'test', 'email_address': 'test@gmail.com'}],
+            num_schedules=3
+        )
+        self.ids = list(Schedule.objects.values_list('pk', flat=True))
+
+    def post(self, data):
+        return self.client.post(
+            self.url, data, content_type="application/json"
+        )
+
+    def statuses(self):
+        return list(Schedule.objects.order_by('pk').values_list(
+            'status', flat=True
+        ))
+
+    def test_pause_by_ids_with_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(
+                {'status': Schedule.PAUSED, 'ids': self.ids[:2]}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(), {'status': Schedule.PAUSED, 'updated': 2}
+        )
+        self.assertEqual(self.statuses(), [
+            Schedule.PAUSED, Schedule.PAUSED, Schedule.NOT_ADDED
+        ])
+        self.assertEqual(len([
+            query for query in queries
+            if query['sql'].startswith(
+                'UPDATE "schedules_schedule" SET "status"'
+            )
+        ]), 1)
+
+    def test_resume_by_filter(self):
+        Schedule.objects.update(status=Schedule.PAUSED)
+        Schedule.objects.filter(pk=self.ids[0]).update(
+            status=Schedule.COMPLETED
+        )
+        response = self.post({
+            'status': Schedule.ACTIVE,
+            'filter': {'status': Schedule.PAUSED}
+        })
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual(self.statuses(), [
+            Schedule.COMPLETED, Schedule.ACTIVE, Schedule.ACTIVE
+        ])
+
+    def test_filter_is_applied_in_one_statement(self):
+        detail_url = f"/api/schedules/{self.ids[0]}/"
+        self.client.get(detail_url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post({
+                'status': Schedule.PAUSED,
+                'filter': {'status': Schedule.NOT_ADDED}
+            })
+        self.assertEqual(response.json()['updated'], 3)
+        update, = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE "schedules_schedule"')
+        ]
+        self.assertIn('"change_seq"', update)
+        self.assertNotIn('"id" IN', update)
+        self.assertEqual(set(self.statuses()), {Schedule.PAUSED})
+        self.assertEqual(
+            self.client.get(detail_url).json()['status'], Schedule.PAUSED
+        )
+
+    def test_no_op_keeps_the_list_etag(self):
+        etag = self.client.get("/api/schedules/")['ETag']
+        response = self.post({'status': Schedule.ACTIVE, 'ids': self.ids})
+        self.assertEqual(response.json()['updated'], 0)
+        response = self.client.get(
+            "/api/schedules/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_disallowed_transitions_are_skipped(self):
+        Schedule.objects.filter(pk=self.ids[0]).update(
+            status=Schedule.COMPLETED
+        )
+        response = self.post({'status': Schedule.PAUSED, 'ids': self.ids})
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual(self.statuses()[0], Schedule.COMPLETED)
+
+        response = self.post({'status': Schedule.ACTIVE, 'ids': [0]})
+        self.assertEqual(response.json()['updated'], 0)
+
+    def test_bulk_status_changes_the_list_etag(self):
+        etag = self.client.get("/api/schedules/")['ETag']
+        self.post({'status': Schedule.COMPLETED, 'ids': self.ids})
+        response = self.client.get(
+            "/api/schedules/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_invalid_payloads(self):
+        for data in (
+            [],
+            {'ids': self.ids},
+            {'status': Schedule.NOT_ADDED, 'ids': self.ids},
+            {'status': Schedule.PAUSED},
+            {'status': Schedule.PAUSED, 'ids': self.ids, 'filter': {}},
+            {'status': Schedule.PAUSED, 'ids': ['1']},
+            {'status': Schedule.PAUSED, 'filter': {'status': 'unknown'}},
+            {'status': Schedule.PAUSED, 'filter': {}},
+            {'status': Schedule.PAUSED, 'filter': {'stauts': 'AC'}},
+            {'status': Schedule.PAUSED, 'filter': {'status': ''}},
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(self.post(data).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.assertEqual(set(self.statuses()), {Schedule.NOT_ADDED})
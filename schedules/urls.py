@@ -18,5 +18,8 @@ from schedules import views
 
 urlpatterns = [
     path('', views.schedule_list),
+    path('bulk/', views.schedule_bulk),
+    path('bulk-status/', views.schedule_bulk_status),
+    path('changes/', views.schedule_changes_list),
     path('<int:pk>/', views.schedule_one)
 ]
@@ -1,24 +1,96 @@
 import io
+import json
+from functools import partial
+from hashlib import md5
 
 from django.shortcuts import render
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags
+from django.db import transaction
+from django.db.models import Prefetch
 from django.views.decorators.csrf import csrf_exempt
 
+from django.conf import settings
+from rest_framework.exceptions import ParseError
 from rest_framework.parsers import JSONParser
 
-from schedules.models import Schedule
-from schedules.serializers import ScheduleSerializer
+from schedules.engine import schedule_deleted
+from schedules.models import Schedule, Recipient, ChangeCounter
+from schedules.serializers import ScheduleSerializer, SCHEDULE_SPARSE_FIELDS
+from utils.validators import BULK_PAYLOAD_NOT_A_LIST_ERROR,\
+    BULK_PAYLOAD_TOO_LARGE_ERROR, BULK_STATUS_NOT_ALLOWED_ERROR,\
+    BULK_STATUS_SELECTION_ERROR, BULK_STATUS_FILTER_ERROR
+from utils.tasks import change_schedule_status
+from utils.cache import schedule_version, schedule_etag,\
+    get_cached_schedule, cache_schedule
+from utils.changes import change_counter, schedules_deleted,\
+    schedule_changes
+from utils.filters import filter_schedules, get_fields, SCHEDULE_FILTERS
+from utils.metrics import instrument_view, REGISTRY,\
+    PROMETHEUS_CONTENT_TYPE, SCHEDULE_CACHE_REQUESTS
+from utils.pagination import get_page_size, paginate_queryset,\
+    stream_json_array
+
+
+SCHEDULE_COLUMNS = (
+    'id', 'description', 'frequency', 'start_date', 'end_date', 'status',
+    'change_seq'
+)
+CONTENT_COLUMNS = ('subject', 'content')
+
+
+def schedule_queryset(fields=None):
+    """
+    schedules restricted to the serialized columns, with their text joined
+    from their Content row and their recipients loaded in one batched query
+    instead of one query per schedule. When fields is given, only those
+    columns are fetched and the Content row and recipients are not loaded
+    at all unless fields needs them.
+    """
+    if fields is None:
+        fields = SCHEDULE_COLUMNS + CONTENT_COLUMNS + ('recipients',)
+    columns = ['id'] + [field for field in fields if field in SCHEDULE_COLUMNS]
+    content_columns = [
+        f'body__{field}' for field in fields if field in CONTENT_COLUMNS
+    ]
+    schedules = Schedule.objects.all()
+    if content_columns:
+        schedules = schedules.select_related('body')
+        columns += ['body'] + content_columns
+    schedules = schedules.only(*columns)
+    if 'recipients' not in fields:
+        return schedules
+    recipients = Recipient.objects.only('id', 'name', 'email_address')
+    return schedules.prefetch_related(
+        Prefetch('recipients', queryset=recipients)
+    )
 
 
 @csrf_exempt
+@instrument_view('schedule_list')
 def schedule_list(request):
     """
-    view to fetch all schedules stored or to add a new schedule
+    view to fetch schedules a page at a time or to add a new schedule.
+    GET ?stream=true streams every schedule as a single JSON array.
+    GET filters by status, frequency and the start_date_after/before and
+    end_date_after/before bounds, and ?fields=id,subject returns only the
+    named fields.
+    GET responses carry an ETag and Last-Modified from the version of the
+    schedule collection; a matching conditional GET gets a 304 after a
+    single query.
     """
     if request.method == 'GET':
-        schedules = Schedule.objects.all()
-        serializers = ScheduleSerializer(instance=schedules, many=True)
-        return JsonResponse(serializers.data, safe=False)
+        etag, last_modified = schedule_list_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = schedule_list_response(request)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
 
     elif request.method == 'POST':
         data = JSONParser().parse(request)
@@ -29,29 +101,246 @@ def schedule_list(request):
         return JsonResponse(serializer.errors, status=400)
 
 
+def schedule_list_validators(request):
+    """
+    the ETag and Last-Modified timestamp of a schedule list response. The
+    query string is part of the ETag since each page is its own resource.
+    """
+    version, changed_at = change_counter(ChangeCounter.SCHEDULES)
+    query = md5(request.META.get('QUERY_STRING', '').encode()).hexdigest()
+    return f'"schedules-{version}-{query[:16]}"', int(changed_at.timestamp())
+
+
+def schedule_list_response(request):
+    try:
+        fields = get_fields(request.GET.get('fields'), SCHEDULE_SPARSE_FIELDS)
+        schedules = filter_schedules(schedule_queryset(fields), request.GET)
+    except ValueError as error:
+        return JsonResponse({'detail': str(error)}, status=400)
+
+    if request.GET.get('stream') in ('1', 'true'):
+        return StreamingHttpResponse(
+            stream_json_array(
+                schedules, partial(ScheduleSerializer, fields=fields)
+            ),
+            content_type='application/json'
+        )
+
+    try:
+        page_size = get_page_size(request.GET.get('page_size'))
+        page, next_cursor = paginate_queryset(
+            schedules, request.GET.get('cursor'), page_size
+        )
+    except ValueError as error:
+        return JsonResponse({'detail': str(error)}, status=400)
+
+    serializers = ScheduleSerializer(instance=page, many=True, fields=fields)
+    return JsonResponse({'next': next_cursor, 'results': serializers.data})
+
+
 @csrf_exempt
+@instrument_view('schedule_one')
 def schedule_one(request, pk):
     """
     view to get or update or delete a single schedule corresponding
-    to the primary key passed as an argument to the view.
+    to the primary key passed as an argument to the view. PATCH updates
+    only the fields in the payload.
+    GET responses are cached and carry an ETag; a matching If-None-Match
+    gets a 304 without touching the database.
     """
+    if request.method == 'GET':
+        return schedule_detail(request, pk)
+
     try:
         schedule = Schedule.objects.get(pk=pk)
     except Schedule.DoesNotExist:
         return HttpResponse(status=404)
 
-    if request.method == 'GET':
-        serializer = ScheduleSerializer(instance=schedule)
-        return JsonResponse(serializer.data, status=200)
-
-    elif request.method == 'PUT':
+    if request.method in ('PUT', 'PATCH'):
         data = JSONParser().parse(request)
-        serializer = ScheduleSerializer(instance=schedule, data=data)
+        serializer = ScheduleSerializer(
+            instance=schedule, data=data, partial=request.method == 'PATCH'
+        )
         if serializer.is_valid():
             serializer.save()
             return JsonResponse(serializer.data)
         return JsonResponse(serializer.errors, status=400)
 
     elif request.method == 'DELETE':
-        schedule.delete()
+        with transaction.atomic():
+            schedule.delete()
+            schedules_deleted([pk])
+        schedule_deleted(pk)
         return HttpResponse(status=204)
+
+
+def schedule_detail(request, pk):
+    version = schedule_version(pk)
+    etag = schedule_etag(pk, version)
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        SCHEDULE_CACHE_REQUESTS.labels('not_modified').inc()
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    body = get_cached_schedule(pk, version)
+    if body is None:
+        SCHEDULE_CACHE_REQUESTS.labels('miss').inc()
+        try:
+            schedule = schedule_queryset().get(pk=pk)
+        except Schedule.DoesNotExist:
+            return HttpResponse(status=404)
+        body = JsonResponse(ScheduleSerializer(instance=schedule).data).content
+        cache_schedule(pk, version, body)
+    else:
+        SCHEDULE_CACHE_REQUESTS.labels('hit').inc()
+
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+@csrf_exempt
+@instrument_view('schedule_changes')
+def schedule_changes_list(request):
+    """
+    view to fetch the schedules written and the ids of those deleted after
+    the `since` token of an earlier response, oldest change first. Without
+    a token every schedule is returned, so that a mirror can start empty.
+    Keep following `next` while `more` is true.
+    """
+    if request.method != 'GET':
+        return HttpResponse(status=405)
+
+    try:
+        page_size = get_page_size(request.GET.get('page_size'))
+        schedules, deleted, next_token, more = schedule_changes(
+            schedule_queryset(), request.GET.get('since'), page_size
+        )
+    except ValueError as error:
+        return JsonResponse({'detail': str(error)}, status=400)
+
+    serializers = ScheduleSerializer(instance=schedules, many=True)
+    return JsonResponse({
+        'changes': serializers.data, 'deleted': deleted,
+        'next': next_token, 'more': more
+    })
+
+
+def parse_bulk_payload(request):
+    """
+    parse a JSON array or newline delimited JSON (application/x-ndjson)
+    request body into a list of schedule payloads
+    """
+    if request.content_type == 'application/x-ndjson':
+        try:
+            return [
+                json.loads(line) for line in request.body.splitlines()
+                if line.strip()
+            ]
+        except ValueError as error:
+            raise ParseError(f'NDJSON parse error - {error}')
+    return JSONParser().parse(request)
+
+
+@csrf_exempt
+@instrument_view('schedule_bulk')
+def schedule_bulk(request):
+    """
+    view to create many schedules in a single request. Responds with one
+    result per submitted schedule: its id on success, or its errors.
+    """
+    if request.method != 'POST':
+        return HttpResponse(status=405)
+
+    try:
+        data = parse_bulk_payload(request)
+    except ParseError as error:
+        return JsonResponse({'detail': str(error)}, status=400)
+    if not isinstance(data, list):
+        return JsonResponse(
+            {'detail': BULK_PAYLOAD_NOT_A_LIST_ERROR}, status=400
+        )
+    if len(data) > settings.SCHEDULES_BULK_MAX_ITEMS:
+        return JsonResponse(
+            {'detail': BULK_PAYLOAD_TOO_LARGE_ERROR}, status=400
+        )
+
+    serializer = ScheduleSerializer(data=data, many=True)
+    if serializer.is_valid():
+        schedules = serializer.save()
+        return JsonResponse(
+            [{'id': schedule.pk} for schedule in schedules],
+            status=201, safe=False
+        )
+    return JsonResponse(serializer.errors, status=400, safe=False)
+
+
+@csrf_exempt
+@instrument_view('schedule_bulk_status')
+def schedule_bulk_status(request):
+    """
+    view to pause, resume or complete many schedules with one UPDATE.
+    Takes the target status and either a list of ids or a filter object
+    with the filters of the schedule list. Schedules whose status cannot
+    move to the target are left alone; responds with how many changed.
+    """
+    if request.method != 'POST':
+        return HttpResponse(status=405)
+
+    try:
+        data = JSONParser().parse(request)
+    except ParseError as error:
+        return JsonResponse({'detail': str(error)}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse(
+            {'detail': BULK_STATUS_SELECTION_ERROR}, status=400
+        )
+
+    status = data.get('status')
+    if status not in Schedule.STATUS_TRANSITIONS:
+        return JsonResponse({'detail': BULK_STATUS_NOT_ALLOWED_ERROR.format(
+            ', '.join(Schedule.STATUS_TRANSITIONS)
+        )}, status=400)
+
+    ids, filters = data.get('ids'), data.get('filter')
+    if isinstance(ids, list) and filters is None and all(
+        isinstance(pk, int) for pk in ids
+    ):
+        if len(ids) > settings.SCHEDULES_BULK_MAX_ITEMS:
+            return JsonResponse(
+                {'detail': BULK_PAYLOAD_TOO_LARGE_ERROR}, status=400
+            )
+        schedules = Schedule.objects.filter(pk__in=ids)
+    elif isinstance(filters, dict) and ids is None:
+        # filter_schedules ignores unknown and empty filters, which here
+        # would select every schedule
+        if not filters or not set(filters) <= set(SCHEDULE_FILTERS) or not all(
+            isinstance(value, str) and value for value in filters.values()
+        ):
+            return JsonResponse({'detail': BULK_STATUS_FILTER_ERROR.format(
+                ', '.join(SCHEDULE_FILTERS)
+            )}, status=400)
+        try:
+            schedules = filter_schedules(Schedule.objects.all(), filters)
+        except ValueError as error:
+            return JsonResponse({'detail': str(error)}, status=400)
+    else:
+        return JsonResponse(
+            {'detail': BULK_STATUS_SELECTION_ERROR}, status=400
+        )
+
+    updated = change_schedule_status(schedules, status)
+    return JsonResponse({'status': status, 'updated': updated})
+
+
+def metrics(request):
+    """
+    view exposing the metrics of this process in the Prometheus text format.
+    Counters are kept per process, so behind several web workers each
+    scrape reports the worker that answered it; aggregate across workers,
+    and collect the Celery worker metrics, through StatsD
+    """
+    return HttpResponse(
+        REGISTRY.expose(), content_type=PROMETHEUS_CONTENT_TYPE
+    )
@@ -0,0 +1,394 @@
+import asyncio
+import os
+import re
+import ssl
+import threading
+import time
+from base64 import b64encode
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage
+from django.core.mail.message import DNS_NAME, sanitize_address
+
+from utils import metrics
+
+CONNECTION_ERRORS = (
+    OSError, ConnectionError, asyncio.TimeoutError,
+    asyncio.IncompleteReadError
+)
+
+
+class SMTPReplyError(Exception):
+    def __init__(self, code: int, text: str):
+        super().__init__(f"{code} {text}")
+        self.code = code
+        self.text = text
+
+
+class AsyncSMTPConnection:
+    """
+    minimal asyncio SMTP client: EHLO, STARTTLS or implicit TLS, AUTH PLAIN
+    and, when the server advertises PIPELINING, sending the whole envelope
+    in one write
+    """
+    def __init__(
+        self, host: str, port: int, username: str = None,
+        password: str = None, use_tls: bool = False, use_ssl: bool = False,
+        timeout: float = None
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.extensions = set()
+        self.reader = None
+        self.writer = None
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+    async def connect(self):
+        ssl_context = ssl.create_default_context() if self.use_ssl else None
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=ssl_context),
+            self.timeout
+        )
+        await self.expect(220)
+        await self.ehlo()
+        if self.use_tls:
+            await self.command('STARTTLS', 220)
+            await self.start_tls()
+            await self.ehlo()
+        if self.username:
+            await self.login()
+
+    async def start_tls(self):
+        ssl_context = ssl.create_default_context()
+        await self.writer.drain()
+        if hasattr(self.writer, 'start_tls'):
+            await asyncio.wait_for(self.writer.start_tls(
+                ssl_context, server_hostname=self.host
+            ), self.timeout)
+            return
+        # StreamWriter.start_tls only exists from Python 3.11, upgrade the
+        # transport through the loop and wrap it in a new writer instead
+        loop = asyncio.get_running_loop()
+        protocol = self.writer.transport.get_protocol()
+        transport = await asyncio.wait_for(loop.start_tls(
+            self.writer.transport, protocol, ssl_context,
+            server_hostname=self.host
+        ), self.timeout)
+        protocol._transport = transport
+        self.writer = asyncio.StreamWriter(
+            transport, protocol, self.reader, loop
+        )
+
+    async def read_reply(self) -> Tuple[int, str]:
+        lines = []
+        while True:
+            line = await asyncio.wait_for(
+                self.reader.readline(), self.timeout
+            )
+            if not line:
+                raise ConnectionError("connection closed by server")
+            lines.append(line[4:].decode(errors='replace').strip())
+            if line[3:4] != b'-':
+                return int(line[:3]), '\n'.join(lines)
+
+    async def expect(self, *codes) -> Tuple[int, str]:
+        code, text = await self.read_reply()
+        if code not in codes:
+            raise SMTPReplyError(code, text)
+        return code, text
+
+    async def command(self, line: str, *codes) -> Tuple[int, str]:
+        self.writer.write(line.encode() + b'\r\n')
+        await self.writer.drain()
+        return await self.expect(*codes)
+
+    async def ehlo(self):
+        code, text = await self.command(f'EHLO {DNS_NAME}', 250)
+        self.extensions = {
+            line.split()[0].upper()
+            for line in text.splitlines()[1:] if line.strip()
+        }
+
+    async def login(self):
+        credentials = f'\0{self.username}\0{self.password}'.encode()
+        await self.command(
+            f'AUTH PLAIN {b64encode(credentials).decode()}', 235
+        )
+
+    async def sendmail(
+        self, from_address: str, recipients: List[str], data: bytes
+    ) -> Dict[str, str]:
+        """
+        send one message, returning the recipients the server refused
+        mapped to its reply. Raises SMTPReplyError when the message as a
+        whole is rejected.
+        """
+        envelope = [f'MAIL FROM:<{from_address}>'] + [
+            f'RCPT TO:<{recipient}>' for recipient in recipients
+        ] + ['DATA']
+        if 'PIPELINING' in self.extensions:
+            self.writer.write(''.join(
+                f'{line}\r\n' for line in envelope
+            ).encode())
+            await self.writer.drain()
+            replies = [await self.read_reply() for line in envelope]
+        else:
+            replies = []
+            for line in envelope:
+                self.writer.write(line.encode() + b'\r\n')
+                await self.writer.drain()
+                replies.append(await self.read_reply())
+                if line.startswith('MAIL') and replies[0][0] != 250:
+                    break
+
+        code, text = replies[0]
+        if code != 250:
+            raise SMTPReplyError(code, text)
+        refused = {
+            recipient: f'{code} {text}'
+            for recipient, (code, text) in zip(recipients, replies[1:-1])
+            if code not in (250, 251)
+        }
+
+        code, text = replies[-1]
+        if code != 354:
+            await self.command('RSET', 250)
+            if len(refused) == len(recipients):
+                return refused
+            raise SMTPReplyError(code, text)
+        if len(refused) == len(recipients):
+            await self.command('.', 250, 554)
+            return refused
+
+        self.writer.write(dot_stuff(data) + b'.\r\n')
+        await self.writer.drain()
+        await self.expect(250)
+        return refused
+
+    async def noop(self) -> bool:
+        try:
+            await self.command('NOOP', 250)
+        except (SMTPReplyError,) + CONNECTION_ERRORS:
+            return False
+        return True
+
+    async def quit(self):
+        try:
+            await self.command('QUIT', 221)
+        except (SMTPReplyError,) + CONNECTION_ERRORS:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def dot_stuff(data: bytes) -> bytes:
+    data = re.sub(rb'(?m)^\.', b'..', data)
+    if not data.endswith(b'\r\n'):
+        data += b'\r\n'
+    return data
+
+
+def envelope(message: EmailMessage) -> Tuple[str, List[str], bytes]:
+    encoding = message.encoding or settings.DEFAULT_CHARSET
+    from_address = sanitize_address(message.from_email, encoding)
+    recipients = [
+        sanitize_address(address, encoding)
+        for address in message.recipients()
+    ]
+    data = message.message().as_bytes(linesep='\r\n')
+    return from_address, recipients, data
+
+
+class AsyncDeliveryEngine:
+    """
+    delivers a batch of messages over several concurrent SMTP connections
+    from one process. At most connections_per_host connections are open to
+    the SMTP host at a time and at most queue_size prepared messages wait
+    for a free connection, so memory stays bounded for large batches.
+
+    The event loop and the idle connections outlive a batch, so the next
+    batch of the worker reuses them instead of paying for a TCP, TLS and
+    AUTH handshake per connection again. Idle connections are recycled
+    like the ones of utils.mail.ConnectionPool. Has the same send_each
+    interface as utils.mail.ConnectionPool.
+    """
+    def __init__(
+        self, connections_per_host: int = None, queue_size: int = None,
+        max_messages: int = None, idle_timeout: float = None,
+        health_check_interval: float = None
+    ):
+        self.connections_per_host = connections_per_host or \
+            settings.EMAIL_ASYNC_CONNECTIONS_PER_HOST
+        self.queue_size = queue_size or settings.EMAIL_ASYNC_QUEUE_SIZE
+        self.max_messages = max_messages or settings.EMAIL_POOL_MAX_MESSAGES
+        self.idle_timeout = idle_timeout or settings.EMAIL_POOL_IDLE_TIMEOUT
+        try:
+            self.port = int(settings.EMAIL_PORT)
+        except (TypeError, ValueError):
+            raise ImproperlyConfigured(
+                "EMAIL_PORT must be set to use the asyncio delivery engine"
+            )
+        if not settings.EMAIL_HOST:
+            raise ImproperlyConfigured(
+                "EMAIL_HOST must be set to use the asyncio delivery engine"
+            )
+        self.host = settings.EMAIL_HOST
+        self.health_check_interval = health_check_interval or \
+            settings.EMAIL_POOL_HEALTH_CHECK_INTERVAL
+        self._idle = []
+        self._loop = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    async def open_connection(self) -> AsyncSMTPConnection:
+        connection = AsyncSMTPConnection(
+            host=self.host,
+            port=self.port,
+            username=settings.EMAIL_HOST_USER,
+            password=settings.EMAIL_HOST_PASSWORD,
+            use_tls=bool(settings.EMAIL_USE_TLS),
+            use_ssl=bool(getattr(settings, 'EMAIL_USE_SSL', False)),
+            timeout=getattr(settings, 'EMAIL_TIMEOUT', None)
+        )
+        try:
+            await connection.connect()
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    async def acquire(self) -> AsyncSMTPConnection:
+        while self._idle:
+            connection = self._idle.pop()
+            idle_for = time.monotonic() - connection.last_used
+            if idle_for <= self.idle_timeout and (
+                idle_for <= self.health_check_interval or
+                await connection.noop()
+            ):
+                return connection
+            connection.close()
+        return await self.open_connection()
+
+    async def release(self, connection: AsyncSMTPConnection):
+        connection.last_used = time.monotonic()
+        if connection.messages_sent < self.max_messages and \
+                len(self._idle) < self.connections_per_host:
+            self._idle.append(connection)
+        else:
+            await connection.quit()
+
+    def send_each(self, messages: List[EmailMessage]) -> Dict[str, str]:
+        """
+        send messages, returning the recipients that could not be sent to
+        mapped to the error
+        """
+        if not messages:
+            return {}
+        with self._lock:
+            if self._pid != os.getpid():
+                # the loop and sockets inherited from the parent process
+                # must not be shared with it, drop them without QUIT
+                self._idle, self._loop = [], None
+                self._pid = os.getpid()
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+            return self._loop.run_until_complete(self.deliver(messages))
+
+    def close(self):
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                return
+            idle, self._idle = self._idle, []
+            self._loop.run_until_complete(self.quit_all(idle))
+            self._loop.close()
+            self._loop = None
+
+    async def quit_all(self, connections: List[AsyncSMTPConnection]):
+        await asyncio.gather(
+            *(connection.quit() for connection in connections)
+        )
+
+    async def deliver(self, messages: List[EmailMessage]) -> Dict[str, str]:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        failed = {}
+        workers = [
+            asyncio.ensure_future(self.worker(queue, failed))
+            for _ in range(min(self.connections_per_host, len(messages)))
+        ]
+        producer = asyncio.ensure_future(
+            self.produce(queue, messages, len(workers))
+        )
+        # a worker that raises stops taking from the queue, so wait for
+        # the first error rather than for the producer to fill it
+        tasks = [producer] + workers
+        done, pending = await asyncio.wait(
+            tasks, return_when=asyncio.FIRST_EXCEPTION
+        )
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+        for task in tasks:
+            if task in done and task.exception() is not None:
+                raise task.exception()
+        return failed
+
+    async def produce(
+        self, queue: asyncio.Queue, messages: List[EmailMessage],
+        num_workers: int
+    ):
+        for message in messages:
+            await queue.put(envelope(message))
+        for _ in range(num_workers):
+            await queue.put(None)
+
+    async def worker(self, queue: asyncio.Queue, failed: Dict[str, str]):
+        connection = None
+        send_duration = metrics.SMTP_SEND_DURATION.labels('asyncio')
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                from_address, recipients, data = item
+                try:
+                    if connection is None:
+                        connection = await self.acquire()
+                    start = time.perf_counter()
+                    failed.update(
+                        await connection.sendmail(
+                            from_address, recipients, data
+                        )
+                    )
+                    send_duration.observe(time.perf_counter() - start)
+                    connection.messages_sent += 1
+                    if connection.messages_sent >= self.max_messages:
+                        await connection.quit()
+                        connection = None
+                except SMTPReplyError as error:
+                    failed.update({
+                        recipient: str(error) for recipient in recipients
+                    })
+                except CONNECTION_ERRORS as error:
+                    failed.update({
+                        recipient: repr(error) for recipient in recipients
+                    })
+                    if connection is not None:
+                        connection.close()
+                    connection = None
+        finally:
+            if connection is not None:
+                await self.release(connection)
@@ -0,0 +1,69 @@
+from typing import Iterable, Optional
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+
+def schedule_version_key(pk: int) -> str:
+    return f'schedule:{pk}:version'
+
+
+def schedule_body_key(pk: int, version: str) -> str:
+    return f'schedule:{pk}:{version}:body'
+
+
+def schedule_version(pk: int) -> str:
+    """
+    the current cache version of a schedule, a random token replaced on
+    every change. Cached bodies are keyed by version, so a body serialized
+    from data that changed meanwhile lands under a version nobody reads.
+    Versions expire with the bodies, so a process whose cache missed an
+    invalidation serves a stale version for SCHEDULES_CACHE_TIMEOUT at
+    most.
+    """
+    version = cache.get(schedule_version_key(pk))
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(
+            schedule_version_key(pk), version,
+            settings.SCHEDULES_CACHE_TIMEOUT
+        ):
+            version = cache.get(schedule_version_key(pk)) or version
+    return version
+
+
+def schedule_etag(pk: int, version: str) -> str:
+    return f'"{pk}-{version}"'
+
+
+def get_cached_schedule(pk: int, version: str) -> Optional[bytes]:
+    return cache.get(schedule_body_key(pk, version))
+
+
+def cache_schedule(pk: int, version: str, body: bytes):
+    cache.set(
+        schedule_body_key(pk, version), body, settings.SCHEDULES_CACHE_TIMEOUT
+    )
+
+
+def bump_schedule_versions(pks: Iterable[int]):
+    cache.set_many(
+        {schedule_version_key(pk): uuid4().hex for pk in pks},
+        settings.SCHEDULES_CACHE_TIMEOUT
+    )
+
+
+def invalidate_schedules(pks: Iterable[int]):
+    """
+    give the schedules new cache versions. Inside a transaction the
+    versions are replaced again once it commits, since a reader may have
+    cached the rows as they were before the commit under the first ones.
+    """
+    pks = list(pks)
+    if not pks:
+        return
+    bump_schedule_versions(pks)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: bump_schedule_versions(pks))
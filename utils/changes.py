@@ -0,0 +1,116 @@
+from datetime import datetime
+from typing import Iterable, Tuple
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from schedules.models import ChangeCounter, Schedule, ScheduleTombstone
+from utils.cache import invalidate_schedules
+from utils.pagination import decode_cursor, encode_cursor
+from utils.validators import INVALID_CURSOR_ERROR
+
+
+def bump_change_counter(name: str) -> int:
+    """
+    increment a collection version and return it. The row stays locked
+    until the transaction of the write that bumped it commits, so versions
+    become visible in the order they were handed out.
+    """
+    changes = dict(value=F('value') + 1, changed_at=timezone.now())
+    counters = ChangeCounter.objects.filter(name=name)
+    with transaction.atomic():
+        if not counters.update(**changes):
+            ChangeCounter.objects.get_or_create(name=name)
+            counters.update(**changes)
+        return counters.values_list('value', flat=True).get()
+
+
+def change_counter(name: str) -> Tuple[int, datetime]:
+    """
+    the current version of a collection and when it last changed
+    """
+    counter = ChangeCounter.objects.filter(name=name).values_list(
+        'value', 'changed_at'
+    ).first()
+    return counter or (0, datetime.fromtimestamp(0, timezone.utc))
+
+
+def schedules_changed(pks: Iterable[int]):
+    """
+    record a write to schedules or their recipients: bump the version of
+    the schedule list, stamp the schedules with it for the changes feed
+    and invalidate their cached details
+    """
+    pks = list(pks)
+    with transaction.atomic():
+        change_seq = bump_change_counter(ChangeCounter.SCHEDULES)
+        if pks:
+            Schedule.objects.filter(pk__in=pks).update(change_seq=change_seq)
+    invalidate_schedules(pks)
+
+
+def schedules_deleted(pks: Iterable[int]):
+    """
+    record deleted schedules: like schedules_changed, with a tombstone
+    per schedule in place of the stamp
+    """
+    pks = list(pks)
+    with transaction.atomic():
+        change_seq = bump_change_counter(ChangeCounter.SCHEDULES)
+        ScheduleTombstone.objects.bulk_create([
+            ScheduleTombstone(schedule_id=pk, change_seq=change_seq)
+            for pk in pks
+        ])
+    invalidate_schedules(pks)
+
+
+def decode_change_token(token: str) -> Tuple[int, int]:
+    """
+    the (change_seq, id) position of a changes token, (0, 0) for none.
+    raises ValueError for anything that was not produced by the feed
+    """
+    if not token:
+        return 0, 0
+    position = decode_cursor(token)
+    change_seq, pk = position.get('seq'), position.get('id')
+    if not isinstance(change_seq, int) or not isinstance(pk, int):
+        raise ValueError(INVALID_CURSOR_ERROR)
+    return change_seq, pk
+
+
+def schedule_changes(queryset, token: str = None, page_size: int = 100):
+    """
+    the schedules and tombstones written after a changes token, in the
+    order of their (change_seq, id), at most page_size of them. Returns
+    the changed schedules, the deleted ids, the token to resume from and
+    whether more changes follow.
+    """
+    change_seq, pk = decode_change_token(token)
+    schedules = list(queryset.filter(
+        Q(change_seq__gt=change_seq) | Q(change_seq=change_seq, pk__gt=pk)
+    ).order_by('change_seq', 'pk')[:page_size + 1])
+    tombstones = list(ScheduleTombstone.objects.filter(
+        Q(change_seq__gt=change_seq) |
+        Q(change_seq=change_seq, schedule_id__gt=pk)
+    ).order_by('change_seq', 'schedule_id').values_list(
+        'change_seq', 'schedule_id'
+    )[:page_size + 1])
+
+    entries = sorted(
+        [(schedule.change_seq, schedule.pk, schedule)
+         for schedule in schedules] +
+        [(seq, schedule_id, None) for seq, schedule_id in tombstones],
+        key=lambda entry: entry[:2]
+    )
+    has_more = len(entries) > page_size
+    entries = entries[:page_size]
+    if entries:
+        change_seq, pk = entries[-1][:2]
+    return (
+        [schedule for _, _, schedule in entries if schedule is not None],
+        [schedule_id for _, schedule_id, schedule in entries
+         if schedule is None],
+        encode_cursor({'seq': change_seq, 'id': pk}),
+        has_more
+    )
@@ -0,0 +1,74 @@
+from typing import Iterable, Optional, Set
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_duration
+
+from schedules.models import Schedule
+from utils.validators import INVALID_FIELDS_ERROR,\
+    INVALID_STATUS_FILTER_ERROR, INVALID_FREQUENCY_FILTER_ERROR,\
+    INVALID_DATE_FILTER_ERROR
+
+DATE_RANGE_FILTERS = {
+    'start_date_after': 'start_date__gte',
+    'start_date_before': 'start_date__lte',
+    'end_date_after': 'end_date__gte',
+    'end_date_before': 'end_date__lte',
+}
+SCHEDULE_FILTERS = ('status', 'frequency') + tuple(DATE_RANGE_FILTERS)
+
+
+def split_values(value: str):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def get_fields(value, allowed: Iterable[str]) -> Optional[Set[str]]:
+    """
+    parse the fields query parameter into the set of fields to serialize,
+    or None for all of them
+    """
+    if value in (None, ''):
+        return None
+    fields = set(split_values(value))
+    if not fields or not fields <= set(allowed):
+        raise ValueError(INVALID_FIELDS_ERROR)
+    return fields
+
+
+def parse_filter_date(name: str, value: str):
+    try:
+        date = parse_datetime(value)
+    except ValueError:
+        date = None
+    if date is None:
+        raise ValueError(INVALID_DATE_FILTER_ERROR.format(name))
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def filter_schedules(queryset, params):
+    """
+    narrow a schedule queryset by the status, frequency and date range
+    query parameters. status takes a comma separated list.
+    raises ValueError for values that cannot be parsed
+    """
+    if params.get('status'):
+        statuses = split_values(params['status'])
+        if not set(statuses) <= {
+            status for status, _ in Schedule.SCHEDULE_STATUS_CHOICES
+        }:
+            raise ValueError(INVALID_STATUS_FILTER_ERROR)
+        queryset = queryset.filter(status__in=statuses)
+
+    if params.get('frequency'):
+        frequency = parse_duration(params['frequency'])
+        if frequency is None:
+            raise ValueError(INVALID_FREQUENCY_FILTER_ERROR)
+        queryset = queryset.filter(frequency=frequency)
+
+    for name, lookup in DATE_RANGE_FILTERS.items():
+        if params.get(name):
+            queryset = queryset.filter(
+                **{lookup: parse_filter_date(name, params[name])}
+            )
+    return queryset
@@ -0,0 +1,262 @@
+import copy
+import os
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import make_msgid
+from smtplib import SMTPException, SMTPRecipientsRefused,\
+    SMTPResponseException
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.mail import get_connection, EmailMessage
+from django.core.mail.message import DNS_NAME
+
+from utils import metrics
+from utils.async_mail import AsyncDeliveryEngine, envelope
+
+DELIVERY_ENGINE_POOL = 'pool'
+DELIVERY_ENGINE_ASYNCIO = 'asyncio'
+SEND_MODE_TO = 'to'
+SEND_MODE_BCC = 'bcc'
+SEND_MODE_PER_RECIPIENT = 'per_recipient'
+
+
+class PooledConnection:
+    def __init__(self, connection):
+        self.connection = connection
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    pool of open email backend connections for one worker process.
+    Connections are reused across sends instead of paying for a TCP, TLS
+    and AUTH handshake per message. A connection is closed once it has
+    been idle for longer than idle_timeout or has sent max_messages, and
+    is checked with NOOP before reuse when it has been idle for longer
+    than health_check_interval.
+    """
+    def __init__(
+        self, size: int = None, idle_timeout: float = None,
+        max_messages: int = None, health_check_interval: float = None,
+        backend: str = None
+    ):
+        self.size = size or settings.EMAIL_POOL_SIZE
+        self.idle_timeout = idle_timeout or settings.EMAIL_POOL_IDLE_TIMEOUT
+        self.max_messages = max_messages or settings.EMAIL_POOL_MAX_MESSAGES
+        self.health_check_interval = health_check_interval or \
+            settings.EMAIL_POOL_HEALTH_CHECK_INTERVAL
+        self.backend = backend
+        self._idle = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _open(self) -> PooledConnection:
+        connection = get_connection(backend=self.backend)
+        connection.open()
+        return PooledConnection(connection)
+
+    def _is_reusable(self, pooled: PooledConnection) -> bool:
+        idle_for = time.monotonic() - pooled.last_used
+        if idle_for > self.idle_timeout:
+            return False
+        if pooled.messages_sent >= self.max_messages:
+            return False
+        if idle_for > self.health_check_interval:
+            return is_healthy(pooled.connection)
+        return True
+
+    def _acquire(self) -> PooledConnection:
+        with self._lock:
+            if self._pid != os.getpid():
+                # sockets inherited from the parent process must not be
+                # shared with it, drop them without sending QUIT
+                self._idle, self._pid = [], os.getpid()
+            while self._idle:
+                pooled = self._idle.pop()
+                if self._is_reusable(pooled):
+                    return pooled
+                close_quietly(pooled.connection)
+        return self._open()
+
+    def _release(self, pooled: PooledConnection):
+        pooled.last_used = time.monotonic()
+        with self._lock:
+            if pooled.messages_sent < self.max_messages and \
+                    len(self._idle) < self.size:
+                self._idle.append(pooled)
+                return
+        close_quietly(pooled.connection)
+
+    @contextmanager
+    def connection(self):
+        """
+        borrow an open connection. It is returned to the pool afterwards
+        unless the block raised, in which case it is closed.
+        """
+        pooled = self._acquire()
+        try:
+            yield pooled
+        except Exception:
+            close_quietly(pooled.connection)
+            raise
+        self._release(pooled)
+
+    def send_messages(self, messages: List[EmailMessage]) -> int:
+        with self.connection() as pooled:
+            sent = pooled.connection.send_messages(messages) or 0
+            pooled.messages_sent += len(messages)
+        return sent
+
+    def send_each(self, messages: List[EmailMessage]) -> Dict[str, str]:
+        """
+        send messages one at a time over pooled connections so that a
+        message the server rejects does not stop the rest of the batch.
+        Returns the recipients of rejected messages mapped to the error.
+        """
+        failed = {}
+        send_duration = metrics.SMTP_SEND_DURATION.labels(
+            DELIVERY_ENGINE_POOL
+        )
+        for start in range(0, len(messages), self.max_messages):
+            with self.connection() as pooled:
+                for message in messages[start:start + self.max_messages]:
+                    try:
+                        with send_duration.time():
+                            failed.update(
+                                send_message(pooled.connection, message)
+                            )
+                    except (SMTPRecipientsRefused,
+                            SMTPResponseException) as error:
+                        for recipient in message.recipients():
+                            failed[recipient] = str(error)
+                    pooled.messages_sent += 1
+        return failed
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            close_quietly(pooled.connection)
+
+
+class PreparedEmailMessage(EmailMessage):
+    """
+    message that reuses a MIME template whose subject and body were
+    encoded once for the whole batch, only setting its own headers
+    """
+    def __init__(
+        self, template, subject, body, from_email, to=None, bcc=None
+    ):
+        super().__init__(subject, body, from_email, to=to, bcc=bcc)
+        self.template = template
+
+    def message(self):
+        msg = copy.deepcopy(self.template)
+        msg['Message-ID'] = make_msgid(domain=DNS_NAME)
+        if self.to:
+            msg['To'] = ', '.join(str(address) for address in self.to)
+        return msg
+
+
+def build_messages(
+    subject: str, body: str, from_email: str, recipients: List[str],
+    mode: str = None, chunk_size: int = None
+) -> List[EmailMessage]:
+    """
+    build the messages of one send. SEND_MODE_PER_RECIPIENT sends one
+    message to each recipient, SEND_MODE_BCC one message per chunk of
+    blind copied recipients and SEND_MODE_TO a single message with every
+    recipient in its To header.
+    """
+    mode = mode or settings.EMAIL_SEND_MODE
+    chunk_size = chunk_size or settings.EMAIL_BCC_CHUNK_SIZE
+    if mode == SEND_MODE_TO:
+        return [EmailMessage(subject, body, from_email, to=recipients)]
+
+    template = EmailMessage(subject, body, from_email).message()
+    del template['Message-ID']
+    if mode == SEND_MODE_BCC:
+        return [
+            PreparedEmailMessage(
+                template, subject, body, from_email,
+                bcc=recipients[start:start + chunk_size]
+            )
+            for start in range(0, len(recipients), chunk_size)
+        ]
+    return [
+        PreparedEmailMessage(
+            template, subject, body, from_email, to=[recipient]
+        )
+        for recipient in recipients
+    ]
+
+
+def send_message(connection, message: EmailMessage) -> Dict[str, str]:
+    """
+    send one message over an open backend connection, returning the
+    recipients the server refused while accepting the others. The SMTP
+    backend drops those, so SMTP connections are sent through smtplib
+    directly; other backends report none.
+    """
+    if getattr(connection, 'connection', None) is None:
+        connection.send_messages([message])
+        return {}
+    from_address, recipients, data = envelope(message)
+    refused = connection.connection.sendmail(from_address, recipients, data)
+    return {
+        recipient: f'{code} {text.decode(errors="replace")}'
+        for recipient, (code, text) in refused.items()
+    }
+
+
+def is_healthy(connection) -> bool:
+    """
+    NOOP round trip for SMTP connections, other backends are always healthy
+    """
+    if not hasattr(connection, 'connection'):
+        return True
+    if connection.connection is None:
+        return False
+    try:
+        return connection.connection.noop()[0] == 250
+    except (SMTPException, OSError):
+        return False
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except (SMTPException, OSError):
+        pass
+
+
+_pool = None
+
+
+def connection_pool() -> ConnectionPool:
+    """
+    the connection pool of the current process, created on first use
+    """
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool()
+    return _pool
+
+
+_async_engine = None
+
+
+def delivery_engine():
+    """
+    the engine selected by EMAIL_DELIVERY_ENGINE: the blocking connection
+    pool, or the asyncio engine for high concurrency SMTP delivery
+    """
+    global _async_engine
+    if settings.EMAIL_DELIVERY_ENGINE == DELIVERY_ENGINE_ASYNCIO:
+        if _async_engine is None:
+            _async_engine = AsyncDeliveryEngine()
+        return _async_engine
+    return connection_pool()
@@ -0,0 +1,440 @@
+import logging
+import math
+import socket
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Dict, Iterator, List, Tuple
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (
+    .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60
+)
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+logger = logging.getLogger(__name__)
+
+
+class StatsdClient:
+    """
+    fire and forget StatsD over UDP. The address is resolved on the first
+    send rather than on import, and again at most every retry_interval
+    seconds while it does not resolve; samples are dropped meanwhile and
+    send errors are ignored, so that a missing collector never fails a
+    request.
+    """
+    def __init__(
+        self, host: str, port: int, prefix: str = '',
+        retry_interval: float = 60
+    ):
+        self.host = host
+        self.port = port
+        self.prefix = f'{prefix}.' if prefix else ''
+        self.retry_interval = retry_interval
+        self.address = None
+        self.socket = None
+        self._resolve_after = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> bool:
+        with self._lock:
+            if self.socket is not None:
+                return True
+            if time.monotonic() < self._resolve_after:
+                return False
+            try:
+                family, _, _, _, address = socket.getaddrinfo(
+                    self.host, self.port, type=socket.SOCK_DGRAM
+                )[0]
+                sock = socket.socket(family, socket.SOCK_DGRAM)
+            except OSError as error:
+                self._resolve_after = time.monotonic() + self.retry_interval
+                logger.warning(
+                    "StatsD host %s:%s unavailable, dropping samples: %s",
+                    self.host, self.port, error
+                )
+                return False
+            sock.setblocking(False)
+            self.address, self.socket = address, sock
+            return True
+
+    def send(self, name: str, value, kind: str):
+        if self.socket is None and not self._connect():
+            return
+        try:
+            self.socket.sendto(
+                f'{self.prefix}{name}:{value}|{kind}'.encode(), self.address
+            )
+        except OSError:
+            pass
+
+    def close(self):
+        with self._lock:
+            if self.socket is not None:
+                self.socket.close()
+                self.socket = None
+
+
+_statsd = None
+
+
+def configure_statsd(host: str = None, port: int = 8125, prefix: str = ''):
+    """
+    send every sample to StatsD at host:port as well, or stop when host is
+    None. Configured from the METRICS_STATSD_* settings on import.
+    """
+    global _statsd
+    if _statsd is not None:
+        _statsd.close()
+    _statsd = StatsdClient(host, port, prefix) if host else None
+
+
+class CounterChild:
+    __slots__ = ('value', 'statsd_name', '_lock')
+
+    def __init__(self, statsd_name: str):
+        self.value = 0
+        self.statsd_name = statsd_name
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+        if _statsd is not None:
+            _statsd.send(self.statsd_name, amount, 'c')
+
+
+class GaugeChild:
+    __slots__ = ('value', 'statsd_name', '_lock')
+
+    def __init__(self, statsd_name: str):
+        self.value = 0
+        self.statsd_name = statsd_name
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+        if _statsd is not None:
+            _statsd.send(self.statsd_name, value, 'g')
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+            value = self.value
+        if _statsd is not None:
+            _statsd.send(self.statsd_name, value, 'g')
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+class Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', 'statsd_name', '_lock')
+
+    def __init__(self, statsd_name: str, upper_bounds: Tuple[float]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0
+        self.statsd_name = statsd_name
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+        if _statsd is not None:
+            _statsd.send(self.statsd_name, round(value * 1000, 3), 'ms')
+
+    def time(self) -> Timer:
+        """
+        context manager observing the seconds spent in its block
+        """
+        return Timer(self)
+
+
+class Metric:
+    """
+    a named metric with optional labels. Each combination of label values
+    is a child holding its own value; hot paths should keep the child
+    returned by labels() rather than looking it up per sample. Unlabelled
+    metrics forward inc/set/observe to their only child.
+    """
+    kind = None
+
+    def __init__(
+        self, name: str, documentation: str, labelnames=(), registry=None
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(
+                    f"{self.name} expects labels {self.labelnames}"
+                )
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self.new_child(
+                        '.'.join((self.name,) + key)
+                    )
+        return child
+
+    def new_child(self, statsd_name: str):
+        raise NotImplementedError
+
+    def children(self) -> List[Tuple[Dict[str, str], object]]:
+        with self._lock:
+            items = list(self._children.items())
+        return [(dict(zip(self.labelnames, key)), child)
+                for key, child in items]
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        for labels, child in self.children():
+            yield self.name, labels, child.value
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def new_child(self, statsd_name):
+        return CounterChild(statsd_name)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def new_child(self, statsd_name):
+        return GaugeChild(statsd_name)
+
+    def set(self, value):
+        self._default.set(value)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets=DEFAULT_BUCKETS, **kwargs):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(*args, **kwargs)
+
+    def new_child(self, statsd_name):
+        return HistogramChild(statsd_name, self.upper_bounds)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self) -> Timer:
+        return self._default.time()
+
+    def samples(self):
+        for labels, child in self.children():
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            bounds = self.upper_bounds + (math.inf,)
+            for upper_bound, count in zip(bounds, counts):
+                cumulative += count
+                yield f'{self.name}_bucket', dict(
+                    labels, le=format_value(float(upper_bound))
+                ), cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+
+    def expose(self) -> str:
+        """
+        every metric in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(
+                    f'{name}{format_labels(labels)} {format_value(value)}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, value.replace('\\', r'\\').replace(
+            '"', r'\"'
+        ).replace('\n', r'\n'))
+        for name, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+def format_value(value) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def timed(histogram: Histogram):
+    """
+    decorator observing the duration of every call of the function
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with histogram.time():
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_view(view_name: str):
+    """
+    decorator recording the latency and response status of a view
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            start = time.perf_counter()
+            response = view(request, *args, **kwargs)
+            HTTP_REQUEST_DURATION.labels(
+                view_name, request.method
+            ).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(
+                view_name, request.method, response.status_code
+            ).inc()
+            return response
+        return wrapper
+    return decorator
+
+
+# the metrics of the web process answering the scrape, exposed at /metrics
+REGISTRY = Registry()
+# metrics recorded in Celery worker processes, which no /metrics endpoint
+# serves. They are only reported through StatsD (METRICS_STATSD_HOST).
+WORKER_REGISTRY = Registry()
+
+DISPATCH_DURATION = Histogram(
+    'schedules_dispatch_duration_seconds',
+    'Duration of task_send_email ticks.',
+    registry=WORKER_REGISTRY
+)
+DISPATCH_DUE = Gauge(
+    'schedules_dispatch_due',
+    'Schedules found due by the last dispatcher tick.',
+    registry=WORKER_REGISTRY
+)
+DISPATCHED = Counter(
+    'schedules_dispatched_total',
+    'Schedule runs enqueued for sending by the dispatcher.',
+    registry=WORKER_REGISTRY
+)
+ENGINE_SCHEDULES = Gauge(
+    'schedules_engine_schedules',
+    'Schedules waiting in the scheduling engine of the dispatcher.',
+    registry=WORKER_REGISTRY
+)
+SEND_DURATION = Histogram(
+    'schedules_send_duration_seconds',
+    'Duration of send_email_to_schedule tasks.',
+    registry=WORKER_REGISTRY
+)
+EMAILS_SENT = Counter(
+    'schedules_emails_sent_total',
+    'Recipients a schedule run was sent to.',
+    registry=WORKER_REGISTRY
+)
+EMAILS_FAILED = Counter(
+    'schedules_emails_failed_total',
+    'Recipients the mail server rejected.',
+    registry=WORKER_REGISTRY
+)
+EMAILS_SKIPPED = Counter(
+    'schedules_emails_skipped_total',
+    'Recipients skipped because the delivery ledger already had them.',
+    registry=WORKER_REGISTRY
+)
+SMTP_SEND_DURATION = Histogram(
+    'schedules_smtp_send_duration_seconds',
+    'Time to hand one message to the mail server.',
+    labelnames=('engine',),
+    registry=WORKER_REGISTRY
+)
+RECIPIENT_UPSERT_DURATION = Histogram(
+    'schedules_recipient_upsert_duration_seconds',
+    'Duration of recipient upserts.'
+)
+RECIPIENTS_CREATED = Counter(
+    'schedules_recipients_created_total',
+    'Recipients inserted by recipient upserts.'
+)
+SCHEDULE_CACHE_REQUESTS = Counter(
+    'schedules_detail_cache_requests_total',
+    'Schedule detail GETs by cache result: hit, miss or not_modified.',
+    labelnames=('result',)
+)
+HTTP_REQUEST_DURATION = Histogram(
+    'schedules_http_request_duration_seconds',
+    'Latency of the schedules API views.',
+    labelnames=('view', 'method')
+)
+HTTP_REQUESTS = Counter(
+    'schedules_http_requests_total',
+    'Responses of the schedules API views.',
+    labelnames=('view', 'method', 'status')
+)
+
+configure_statsd(
+    settings.METRICS_STATSD_HOST, settings.METRICS_STATSD_PORT,
+    settings.METRICS_STATSD_PREFIX
+)
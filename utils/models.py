@@ -1,4 +1,6 @@
 from datetime import date, timedelta, datetime
+from hashlib import blake2b
+
 from django.utils import timezone
 
 
@@ -32,3 +34,42 @@ def default_end_date():
 
 def default_start_date():
     return default_date_time()
+
+
+def content_digest(subject: str, content: str) -> str:
+    """
+    hex BLAKE2b digest addressing a subject and content pair. The subject
+    is length prefixed so that no two pairs share their input.
+    """
+    data = f'{len(subject)}:{subject}{content}'.encode()
+    return blake2b(data, digest_size=32).hexdigest()
+
+
+def schedule_fingerprint(
+    description: str, body_digest: str, frequency: timedelta,
+    start_date: datetime, end_date: datetime
+) -> str:
+    """
+    hex BLAKE2b digest of the fields a schedule must be unique on, with
+    the text of its Content row standing in by digest. Durations count
+    microseconds and dates are in UTC, so equal values hash the same
+    whatever time zone they were given in.
+    """
+    data = '|'.join((
+        f'{len(description)}:{description}', body_digest,
+        str(frequency // timedelta(microseconds=1)),
+        start_date.astimezone(timezone.utc).isoformat(),
+        end_date.astimezone(timezone.utc).isoformat()
+    )).encode()
+    return blake2b(data, digest_size=32).hexdigest()
+
+
+def schedule_data_fingerprint(data) -> str:
+    """
+    schedule_fingerprint of a mapping of schedule fields, such as the
+    validated data of a serializer
+    """
+    return schedule_fingerprint(
+        data['description'], content_digest(data['subject'], data['content']),
+        data['frequency'], data['start_date'], data['end_date']
+    )
@@ -0,0 +1,97 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import Dict, Iterator
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from utils.validators import INVALID_CURSOR_ERROR, INVALID_PAGE_SIZE_ERROR
+
+
+def encode_cursor(position: Dict) -> str:
+    """
+    encode a keyset position into an opaque, url safe cursor
+    """
+    raw = json.dumps(position, separators=(',', ':')).encode()
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Dict:
+    """
+    decode a cursor produced by encode_cursor.
+    raises ValueError for anything that was not produced by encode_cursor
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError):
+        raise ValueError(INVALID_CURSOR_ERROR)
+    if not isinstance(position, dict):
+        raise ValueError(INVALID_CURSOR_ERROR)
+    return position
+
+
+def get_page_size(value) -> int:
+    """
+    parse the page_size query parameter, capped at SCHEDULES_MAX_PAGE_SIZE
+    """
+    if value in (None, ''):
+        return settings.SCHEDULES_PAGE_SIZE
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(INVALID_PAGE_SIZE_ERROR)
+    if page_size < 1:
+        raise ValueError(INVALID_PAGE_SIZE_ERROR)
+    return min(page_size, settings.SCHEDULES_MAX_PAGE_SIZE)
+
+
+def paginate_queryset(queryset, cursor: str = None, page_size: int = None):
+    """
+    keyset pagination on id. Returns the page of instances and the cursor
+    of the next page, or None when this is the last page.
+    """
+    if page_size is None:
+        page_size = settings.SCHEDULES_PAGE_SIZE
+    if cursor:
+        last_id = decode_cursor(cursor).get('id')
+        if not isinstance(last_id, int):
+            raise ValueError(INVALID_CURSOR_ERROR)
+        queryset = queryset.filter(pk__gt=last_id)
+
+    page = list(queryset.order_by('pk')[:page_size + 1])
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor({'id': page[-1].pk})
+    return page, next_cursor
+
+
+def stream_json_array(
+    queryset, serializer_class, chunk_size: int = None
+) -> Iterator[str]:
+    """
+    serialize a queryset into a JSON array one keyset chunk at a time so
+    that memory use does not grow with the size of the table. Chunks are
+    fetched by id rather than with QuerySet.iterator() so that any
+    prefetch_related lookups on the queryset are still applied per chunk.
+    """
+    if chunk_size is None:
+        chunk_size = settings.SCHEDULES_STREAM_CHUNK_SIZE
+    encoder = DjangoJSONEncoder()
+    yield '['
+    separator = ''
+    last_id = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last_id is not None:
+            chunk = chunk.filter(pk__gt=last_id)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            break
+        for instance in chunk:
+            data = serializer_class(instance=instance).data
+            yield separator + encoder.encode(data)
+            separator = ','
+        last_id = chunk[-1].pk
+    yield ']'
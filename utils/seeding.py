@@ -0,0 +1,262 @@
+import io
+import random
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Sequence
+
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction,\
+    DEFAULT_DB_ALIAS
+from django.db.models import Max
+
+from schedules.models import Schedule, Recipient, Interval, ChangeCounter
+from utils.changes import bump_change_counter
+from utils.models import default_date_time, content_digest,\
+    schedule_fingerprint
+from utils.serializers import upsert_contents
+
+FANOUT_FIXED = 'fixed'
+FANOUT_UNIFORM = 'uniform'
+FANOUT_PARETO = 'pareto'
+FANOUT_DISTRIBUTIONS = (FANOUT_FIXED, FANOUT_UNIFORM, FANOUT_PARETO)
+# largest fan-out of the uniform and pareto distributions when none is given
+FANOUT_MAX_FACTOR = 10
+FREQUENCIES = (timedelta(hours=1), timedelta(days=1), timedelta(weeks=1))
+SCHEDULE_FIELDS = (
+    'id', 'description', 'body', 'frequency', 'start_date', 'end_date',
+    'status', 'next_run_at', 'change_seq', 'fingerprint'
+)
+SEED_CONTENTS = 100
+
+
+def fanout_sampler(
+    rng: random.Random, distribution: str, fanout: int, fanout_max: int
+) -> Callable[[], int]:
+    """
+    recipients per schedule: always fanout, uniform between fanout and
+    fanout_max, or a long tailed pareto starting at fanout and capped at
+    fanout_max
+    """
+    if distribution == FANOUT_FIXED:
+        return lambda: fanout
+    if distribution == FANOUT_UNIFORM:
+        return lambda: rng.randint(fanout, fanout_max)
+    if distribution == FANOUT_PARETO:
+        return lambda: min(
+            fanout_max, int(fanout * rng.paretovariate(1.5))
+        )
+    raise ValueError(f"unknown fan-out distribution {distribution}")
+
+
+def recipient_address(seed: int, number: int) -> str:
+    return f'seed{seed}-recipient{number}@example.com'
+
+
+def sample_indexes(rng: random.Random, population: int, k: int) -> set:
+    """
+    k distinct numbers below population. Much cheaper than rng.sample for
+    the small k and large population of recipient fan-out.
+    """
+    chosen = set()
+    uniform = rng.random
+    while len(chosen) < k:
+        chosen.add(int(uniform() * population))
+    return chosen
+
+
+def format_interval(value: timedelta) -> str:
+    return f'{value.total_seconds()} seconds'
+
+
+def copy_converter(value) -> Callable:
+    if isinstance(value, datetime):
+        return datetime.isoformat
+    if isinstance(value, timedelta):
+        return format_interval
+    return str
+
+
+def copy_rows(model, fields: Sequence[str], rows: List[tuple]):
+    """
+    load rows with a single PostgreSQL COPY. Values must not be NULL or
+    contain tabs, newlines or backslashes, which holds for generated data.
+    Each column is converted by a function picked from its first value.
+    """
+    if not rows:
+        return
+    columns = ', '.join(
+        connection.ops.quote_name(model._meta.get_field(field).column)
+        for field in fields
+    )
+    converters = [copy_converter(value) for value in rows[0]]
+    if all(converter is str for converter in converters):
+        lines = ['\t'.join(map(str, row)) for row in rows]
+    else:
+        lines = [
+            '\t'.join([
+                converter(value)
+                for converter, value in zip(converters, row)
+            ])
+            for row in rows
+        ]
+    data = io.StringIO('\n'.join(lines) + '\n')
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {connection.ops.quote_name(model._meta.db_table)} '
+            f'({columns}) FROM STDIN',
+            data
+        )
+
+
+def execute_rows(model, fields: Sequence[str], rows: List[tuple]):
+    """
+    insert rows with one executemany, converting values with the model
+    fields but without building model instances as bulk_create would
+    """
+    # the connection proxy resolves a thread local on every attribute
+    # access, which adds up over millions of values
+    db = connections[DEFAULT_DB_ALIAS]
+    model_fields = [model._meta.get_field(field) for field in fields]
+    columns = ', '.join(
+        db.ops.quote_name(field.column) for field in model_fields
+    )
+    placeholders = ', '.join(['%s'] * len(fields))
+    with db.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {db.ops.quote_name(model._meta.db_table)} '
+            f'({columns}) VALUES ({placeholders})',
+            [
+                [
+                    field.get_db_prep_save(value, db)
+                    for field, value in zip(model_fields, row)
+                ]
+                for row in rows
+            ]
+        )
+
+
+def insert_rows(model, fields: Sequence[str], rows: List[tuple], use_copy):
+    if use_copy:
+        copy_rows(model, fields, rows)
+    else:
+        execute_rows(model, fields, rows)
+
+
+def next_id(model) -> int:
+    return (model.objects.aggregate(last_id=Max('id'))['last_id'] or 0) + 1
+
+
+def seed_recipients(
+    count: int, seed: int, chunk_size: int, use_copy: bool
+) -> List[int]:
+    """
+    make sure the first count recipients of the seed exist and return
+    their ids, reusing those created by earlier runs with the same seed
+    """
+    existing = list(
+        Recipient.objects.filter(
+            email_address__startswith=f'seed{seed}-recipient'
+        ).order_by('pk').values_list('pk', flat=True)[:count]
+    )
+    first_id = next_id(Recipient)
+    for start in range(len(existing), count, chunk_size):
+        rows = [
+            (first_id + number - len(existing), f'recipient {number}',
+             recipient_address(seed, number))
+            for number in range(start, min(start + chunk_size, count))
+        ]
+        insert_rows(
+            Recipient, ('id', 'name', 'email_address'), rows, use_copy
+        )
+    return existing + list(
+        range(first_id, first_id + count - len(existing))
+    )
+
+
+def seed_schedules(
+    count: int, recipients: int, fanout: int = 5, fanout_max: int = None,
+    distribution: str = FANOUT_FIXED, seed: int = 0,
+    chunk_size: int = 10000, use_copy: bool = None
+) -> Dict[str, int]:
+    """
+    insert count schedules without going through the serializers, each
+    sent to a sample of a shared pool of `recipients` addresses sized by
+    the fan-out distribution and using one of SEED_CONTENTS bodies. The
+    uniform and pareto distributions go up to fanout_max, or
+    FANOUT_MAX_FACTOR times fanout when it is not given. Rows
+    get explicit ids after the current maximum so that the through table
+    is written without reading anything back, which assumes no concurrent
+    writers. Uses COPY on PostgreSQL unless use_copy is False. The same
+    seed and starting database always produce the same rows, with dates
+    relative to the current day.
+    """
+    if use_copy is None:
+        use_copy = connection.vendor == 'postgresql'
+    if fanout_max is None and distribution != FANOUT_FIXED:
+        fanout_max = fanout * FANOUT_MAX_FACTOR
+    fanout_max = max(fanout, fanout_max or fanout)
+    recipients = max(recipients, fanout_max)
+    base_date = default_date_time()
+    through = Schedule.recipients.through
+
+    with transaction.atomic():
+        change_seq = bump_change_counter(ChangeCounter.SCHEDULES)
+        recipient_ids = seed_recipients(
+            recipients, seed, chunk_size, use_copy
+        )
+        texts = [
+            (f'subject {number}', f'content {number}')
+            for number in range(SEED_CONTENTS)
+        ]
+        digests = [content_digest(*text) for text in texts]
+        contents = upsert_contents(texts)
+        content_ids = [contents[digest].pk for digest in digests]
+        first_id = next_id(Schedule)
+        links = 0
+        for start in range(0, count, chunk_size):
+            rng = random.Random(f'{seed}:{start}')
+            sample_fanout = fanout_sampler(
+                rng, distribution, fanout, fanout_max
+            )
+            schedules, memberships = [], []
+            for schedule_id in range(
+                first_id + start, first_id + min(start + chunk_size, count)
+            ):
+                start_date = base_date + timedelta(
+                    minutes=rng.randrange(2 * 24 * 60)
+                )
+                description = f'seeded schedule {schedule_id}'
+                text = schedule_id % SEED_CONTENTS
+                frequency = rng.choice(FREQUENCIES)
+                end_date = start_date + timedelta(days=30)
+                schedules.append((
+                    schedule_id, description, content_ids[text], frequency,
+                    start_date, end_date, Schedule.NOT_ADDED, start_date,
+                    change_seq, schedule_fingerprint(
+                        description, digests[text], frequency, start_date,
+                        end_date
+                    )
+                ))
+                memberships.extend(
+                    (schedule_id, recipient_ids[index]) for index in
+                    sample_indexes(rng, recipients, sample_fanout())
+                )
+            insert_rows(Schedule, SCHEDULE_FIELDS, schedules, use_copy)
+            insert_rows(
+                through, ('schedule_id', 'recipient_id'), memberships,
+                use_copy
+            )
+            links += len(memberships)
+
+        for frequency in FREQUENCIES:
+            Interval.objects.get_or_create(interval=frequency)
+        # explicit ids do not advance the id sequences on PostgreSQL
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [Schedule, Recipient]
+            ):
+                cursor.execute(sql)
+
+    return {
+        'schedules': count, 'recipients': len(recipient_ids),
+        'memberships': links
+    }
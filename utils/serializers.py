@@ -1,51 +1,150 @@
 from typing import List, Dict
 from datetime import timedelta
 
-from schedules.models import Schedule, Recipient, Interval
+from django.db import connection, transaction
+
+from schedules.models import Schedule, Recipient, Interval, Content
 from schedules import tasks
-from mail_api.celery import app
+from utils import metrics
+from utils.models import content_digest
+
+BULK_BATCH_SIZE = 1000
+
 
+@metrics.timed(metrics.RECIPIENT_UPSERT_DURATION)
+def upsert_recipients(recipients: List[Dict]) -> Dict[str, int]:
+    """
+    resolve recipients to ids in a set based way: one email_address__in
+    lookup, one bulk insert of the missing addresses and one re-read.
+    ignore_conflicts lets concurrent requests insert the same address
+    without either of them failing on the unique constraint.
+    """
+    by_address = {
+        recipient['email_address']: recipient for recipient in recipients
+    }
+    if not by_address:
+        return {}
 
-def create_or_get_recipient(recipient: Dict):
-    email_address = recipient.get('email_address')
-    new_created = False
-    if Recipient.objects.filter(email_address=email_address).exists():
-        new_recipient = Recipient.objects.get(email_address=email_address)
-    else:
-        new_recipient = Recipient(**recipient)
-        new_created = True
-    return new_recipient, new_created
+    recipient_ids = dict(
+        Recipient.objects.filter(
+            email_address__in=by_address.keys()
+        ).values_list('email_address', 'id')
+    )
+    missing = [
+        Recipient(**recipient) for email_address, recipient
+        in by_address.items() if email_address not in recipient_ids
+    ]
+    if missing:
+        Recipient.objects.bulk_create(missing, ignore_conflicts=True)
+        metrics.RECIPIENTS_CREATED.inc(len(missing))
+        recipient_ids = dict(
+            Recipient.objects.filter(
+                email_address__in=by_address.keys()
+            ).values_list('email_address', 'id')
+        )
+    return recipient_ids
 
 
 def create_or_update_recipients(
     schedule: Schedule, recipients: List, update: bool
 ):
-    new_recipients, to_be_created = [], []
+    """
+    link the schedule to exactly these recipients. An update diffs them
+    against the current links in one transaction, deleting only the links
+    that were dropped and inserting only the new ones. Recording the
+    change with schedules_changed is left to the caller, in the
+    transaction of the rest of its write.
+    """
+    through = Schedule.recipients.through
+    with transaction.atomic():
+        wanted = set(upsert_recipients(recipients).values())
+        if update:
+            linked = set(through.objects.filter(
+                schedule_id=schedule.pk
+            ).values_list('recipient_id', flat=True))
+            if linked - wanted:
+                through.objects.filter(
+                    schedule_id=schedule.pk, recipient_id__in=linked - wanted
+                ).delete()
+            wanted -= linked
+        through.objects.bulk_create([
+            through(schedule_id=schedule.pk, recipient_id=recipient_id)
+            for recipient_id in wanted
+        ], batch_size=BULK_BATCH_SIZE, ignore_conflicts=True)
+
+
+def upsert_contents(texts: List[tuple]) -> Dict[str, Content]:
+    """
+    resolve (subject, content) pairs to their Content rows by digest with
+    one lookup, one bulk insert of the missing ones and one re-read
+    """
+    by_digest = {
+        content_digest(subject, content): (subject, content)
+        for subject, content in texts
+    }
+    if not by_digest:
+        return {}
+
+    contents = Content.objects.in_bulk(by_digest.keys(), field_name='digest')
+    missing = [
+        Content(digest=digest, subject=subject, content=content)
+        for digest, (subject, content) in by_digest.items()
+        if digest not in contents
+    ]
+    if missing:
+        Content.objects.bulk_create(missing, ignore_conflicts=True)
+        contents = Content.objects.in_bulk(
+            by_digest.keys(), field_name='digest'
+        )
+    return contents
+
+
+def bulk_create_schedules(schedules: List[Schedule]) -> List[Schedule]:
+    """
+    insert schedules with bulk_create and make sure every instance has its
+    primary key set, re-reading them by fingerprint on backends that cannot
+    return ids from a bulk insert. The Content rows of their text and their
+    fingerprints are computed first, as bulk_create does not call save().
+    """
+    contents = upsert_contents([
+        (schedule.subject, schedule.content) for schedule in schedules
+    ])
+    for schedule in schedules:
+        schedule.body = contents[schedule.body_digest]
+        schedule._subject = schedule._content = None
+        schedule.update_fingerprint()
+
+    Schedule.objects.bulk_create(schedules, batch_size=BULK_BATCH_SIZE)
+    if connection.features.can_return_rows_from_bulk_insert:
+        return schedules
 
-    if update:
-        schedule.recipients.clear()
+    schedule_ids = dict(
+        Schedule.objects.filter(
+            fingerprint__in=[schedule.fingerprint for schedule in schedules]
+        ).values_list('fingerprint', 'id')
+    )
+    for schedule in schedules:
+        schedule.pk = schedule_ids[schedule.fingerprint]
+    return schedules
 
-    for recipient in recipients:
-        new_recipient, new_created = create_or_get_recipient(recipient)
-        if new_created:
-            to_be_created.append(new_recipient)
-        new_recipients.append(new_recipient)
 
-    Recipient.objects.bulk_create(to_be_created)
-    schedule.recipients.add(*new_recipients)
+def existing_fingerprints(fingerprints) -> set:
+    """
+    the fingerprints already taken by schedules, with one IN query
+    """
+    return set(Schedule.objects.filter(
+        fingerprint__in=fingerprints
+    ).values_list('fingerprint', flat=True))
 
 
 def create_or_get_interval(schedule: Schedule):
-    frequency = schedule.frequency
-    if not Interval.objects.filter(interval=frequency).exists():
-        interval = Interval.objects.create(interval=frequency)
-        app.conf.beat_schedule[str(interval.interval)] = {
-            'task': 'schedules.tasks.task_send_email',
-            'schedule': interval.interval,
-            'args': (interval.interval,),
-        }
-    else:
-        interval = Interval.objects.get(interval=frequency)
+    """
+    the Interval row for the schedule's frequency. The beat process picks
+    up new rows through schedules.beat.DatabaseScheduler.
+    """
+    interval, created = Interval.objects.get_or_create(
+        interval=schedule.frequency
+    )
     return interval
 
 
@@ -1,8 +1,221 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import islice
+from typing import Optional, Tuple
+
+from django.conf import settings
 from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F, Min, Q
+from django.utils import timezone
 
-from schedules.models import Schedule, Interval
+from schedules.models import Schedule, Interval, Delivery, Content,\
+    ChangeCounter
+from utils.cache import invalidate_schedules
+from utils.changes import bump_change_counter, schedules_changed
 from mail_api.settings import EMAIL_HOST_USER
 
+INVALIDATE_CHUNK_SIZE = 1000
+
 
 def discover_schedules(status_choice):
     return Schedule.objects.filter(status=status_choice)
+
+
+def discover_due_schedules(
+    now: datetime, frequency: timedelta = None, schedule_ids=None
+):
+    """
+    lock and return the schedules whose next run is due, oldest first.
+    The lookup is served by the (status, next_run_at) index, so its cost
+    grows with the number of due schedules rather than the table size.
+    Rows locked by an overlapping tick are skipped. schedule_ids restricts
+    the lookup to the candidates popped from the scheduling engine.
+    Must be evaluated inside a transaction.
+    """
+    schedules = Schedule.objects.select_for_update(skip_locked=True).filter(
+        status__in=[Schedule.ACTIVE, Schedule.NOT_ADDED],
+        next_run_at__lte=now
+    )
+    if frequency is not None:
+        schedules = schedules.filter(frequency=frequency)
+    if schedule_ids is not None:
+        schedules = schedules.filter(pk__in=schedule_ids)
+    return schedules.order_by('next_run_at')[
+        :settings.SCHEDULES_DISPATCH_BATCH_SIZE
+    ]
+
+
+def advance_next_run(schedule: Schedule, now: datetime):
+    """
+    move next_run_at to the first run after now, skipping runs that were
+    missed while the dispatcher was behind
+    """
+    if schedule.frequency > timedelta(0):
+        missed = (now - schedule.next_run_at) // schedule.frequency
+        schedule.next_run_at += schedule.frequency * (missed + 1)
+
+
+def activate_due_schedules(schedules, now: datetime):
+    """
+    mark due schedules ACTIVE and advance their next_run_at with a single
+    UPDATE, without calling save() and re-running Schedule.clean(). Only
+    the schedules that were not ACTIVE yet are recorded as changed, since
+    next_run_at is not part of what clients see.
+    """
+    activated = [
+        schedule.pk for schedule in schedules
+        if schedule.status != Schedule.ACTIVE
+    ]
+    for schedule in schedules:
+        schedule.status = Schedule.ACTIVE
+        advance_next_run(schedule, now)
+    if schedules:
+        Schedule.objects.bulk_update(schedules, ['status', 'next_run_at'])
+    if activated:
+        schedules_changed(activated)
+
+
+def complete_finished_schedules(schedule_ids):
+    """
+    mark schedules COMPLETED with a single UPDATE once their next run
+    falls after end_date. Schedules with no frequency only run once.
+    Only the schedules the UPDATE matched are recorded as changed; the
+    dispatcher holds their row locks, so the ids read first still match.
+    """
+    finished = Schedule.objects.filter(
+        Q(next_run_at__gt=F('end_date')) | Q(frequency=timedelta(0)),
+        pk__in=schedule_ids
+    ).exclude(status=Schedule.COMPLETED)
+    completed_ids = list(finished.values_list('pk', flat=True))
+    if not completed_ids:
+        return 0
+    completed = Schedule.objects.filter(pk__in=completed_ids).update(
+        status=Schedule.COMPLETED
+    )
+    schedules_changed(completed_ids)
+    return completed
+
+
+def change_schedule_status(queryset, status: str) -> int:
+    """
+    move the schedules of queryset to status with a single UPDATE whose
+    WHERE only matches the statuses Schedule.STATUS_TRANSITIONS allows to
+    move to it, so a schedule that changed meanwhile is left alone. The
+    same statement stamps their change_seq; their cached details are then
+    invalidated by reading the stamped ids back in chunks.
+    Resumed schedules keep their next_run_at: the dispatcher sends the run
+    missed while paused and skips the older ones. Returns the number of
+    schedules changed.
+    """
+    sources = Schedule.STATUS_TRANSITIONS[status]
+    with transaction.atomic():
+        change_seq = bump_change_counter(ChangeCounter.SCHEDULES)
+        updated = queryset.filter(status__in=sources).update(
+            status=status, change_seq=change_seq
+        )
+        if not updated:
+            # nothing changed, keep the version of the schedule list
+            transaction.set_rollback(True)
+            return 0
+        schedule_ids = Schedule.objects.filter(
+            change_seq=change_seq
+        ).values_list('pk', flat=True).iterator(
+            chunk_size=INVALIDATE_CHUNK_SIZE
+        )
+        while True:
+            chunk = list(islice(schedule_ids, INVALIDATE_CHUNK_SIZE))
+            if not chunk:
+                break
+            invalidate_schedules(chunk)
+    return updated
+
+
+def claim_deliveries(
+    schedule_id: int, scheduled_run_at: datetime, recipients, claim: str
+) -> list:
+    """
+    claim the recipients of a run for the send identified by claim and
+    return the ones it got. Recipients are claimed by inserting pending
+    ledger rows, so of two overlapping sends of the same run only one
+    gets each recipient. Claims older than EMAIL_DELIVERY_CLAIM_TIMEOUT
+    were left by a send that died and are taken over.
+    """
+    now = timezone.now()
+    deliveries = Delivery.objects.filter(
+        schedule_id=schedule_id, scheduled_run_at=scheduled_run_at
+    )
+    Delivery.objects.bulk_create([
+        Delivery(
+            schedule_id=schedule_id,
+            scheduled_run_at=scheduled_run_at,
+            recipient_id=recipient.pk,
+            claim=claim,
+            claimed_at=now,
+            delivered_at=None
+        )
+        for recipient in recipients
+    ], ignore_conflicts=True)
+    deliveries.filter(
+        delivered_at__isnull=True,
+        claimed_at__lt=now - timedelta(
+            seconds=settings.EMAIL_DELIVERY_CLAIM_TIMEOUT
+        )
+    ).update(claim=claim, claimed_at=now)
+    claimed = set(deliveries.filter(
+        claim=claim, delivered_at__isnull=True
+    ).values_list('recipient_id', flat=True))
+    return [recipient for recipient in recipients if recipient.pk in claimed]
+
+
+def claims_expire_in(
+    schedule_id: int, scheduled_run_at: datetime, claim: str
+) -> Optional[float]:
+    """
+    seconds until the first claim another send holds on the recipients of
+    a run times out, or None when no other send holds any
+    """
+    claimed_at = Delivery.objects.filter(
+        schedule_id=schedule_id, scheduled_run_at=scheduled_run_at,
+        delivered_at__isnull=True
+    ).exclude(claim=claim).aggregate(first=Min('claimed_at'))['first']
+    if claimed_at is None:
+        return None
+    expires_at = claimed_at + timedelta(
+        seconds=settings.EMAIL_DELIVERY_CLAIM_TIMEOUT
+    )
+    return max((expires_at - timezone.now()).total_seconds(), 0)
+
+
+def record_deliveries(
+    schedule_id: int, scheduled_run_at: datetime, claim: str,
+    delivered, failed=()
+):
+    """
+    stamp the claimed rows of the recipients a run was sent to, and drop
+    the claims of the ones the mail server rejected so that a later send
+    of the run retries them
+    """
+    deliveries = Delivery.objects.filter(
+        schedule_id=schedule_id, scheduled_run_at=scheduled_run_at,
+        claim=claim
+    )
+    deliveries.filter(
+        recipient_id__in=[recipient.pk for recipient in delivered]
+    ).update(delivered_at=timezone.now())
+    if failed:
+        deliveries.filter(
+            recipient_id__in=[recipient.pk for recipient in failed]
+        ).delete()
+
+
+@lru_cache(maxsize=settings.EMAIL_CONTENT_CACHE_SIZE)
+def load_content(digest: str) -> Tuple[str, str]:
+    """
+    the subject and content of a Content row. A digest always names the
+    same text, so each worker process reads every body once and keeps the
+    EMAIL_CONTENT_CACHE_SIZE most recently sent ones.
+    """
+    return Content.objects.values_list('subject', 'content').get(
+        digest=digest
+    )
@@ -1,3 +1,6 @@
+import socketserver
+import threading
+import time
 from datetime import datetime, date, timedelta
 
 from schedules.serializers import ScheduleSerializer
@@ -46,3 +49,96 @@ def serialize_input_data(
         serializer = ScheduleSerializer(data=data)
         if serializer.is_valid():
             serializer.save()
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply("220 sink ready")
+        envelope = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith('EHLO'):
+                self.reply("250-sink")
+                self.reply("250-AUTH PLAIN")
+                self.reply("250 PIPELINING")
+            elif command.startswith('HELO'):
+                self.reply("250 sink")
+            elif command.startswith('AUTH'):
+                self.reply("235 authenticated")
+            elif command.startswith('RCPT TO'):
+                if any(bad in command for bad in server.rejected):
+                    self.reply("550 mailbox unavailable")
+                else:
+                    envelope.append(line.decode().strip()[8:].strip('<> '))
+                    self.reply("250 OK")
+            elif command.startswith(('MAIL FROM', 'RSET')):
+                envelope = []
+                self.reply("250 OK")
+            elif command == 'NOOP':
+                self.reply("250 OK")
+            elif command == 'DATA' and not envelope:
+                self.reply("554 no valid recipients")
+            elif command == 'DATA':
+                self.reply("354 end data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in self.rfile:
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    data.append(data_line)
+                with server.lock:
+                    server.messages.append((envelope, b"".join(data)))
+                envelope = []
+                if server.delay:
+                    time.sleep(server.delay)
+                self.reply("250 OK queued")
+            elif command == 'QUIT':
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 command not implemented")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    minimal local SMTP server that accepts and records every message,
+    used to exercise the SMTP send path in tests and benchmarks.
+    Recipients containing any of the rejected strings are refused and
+    every message is acknowledged after delay seconds, to stand in for the
+    latency of a real mail server.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, host='127.0.0.1', port=0, rejected=(), delay=0):
+        super().__init__((host, port), SMTPSinkHandler)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.rejected = tuple(address.upper() for address in rejected)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(
+            target=self.serve_forever, args=(0.05,), daemon=True
+        ).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
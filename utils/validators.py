@@ -5,7 +5,7 @@ from rest_framework.serializers import ValidationError
 from django.core import exceptions
 from django.utils import timezone
 
-from utils.models import default_date_time
+from utils.models import default_date_time, schedule_data_fingerprint
 
 # Errors for Schedule Model fields
 END_DATE_LESS_THAN_START_DATE_ERROR = "end_date cannot be less than start_date"
@@ -21,6 +21,25 @@ RECIPIENTS_GREATER_THAN_500_ERROR = "Recipients should be less than 500"
 RECIPIENTS_CONTAIN_DUPLICATES_ERROR = "Recipients shouldn't contain duplicates"
 INVALID_EMAIL_ADDRESS_ERROR = "Enter a valid email address."
 
+# Errors for bulk requests
+BULK_PAYLOAD_NOT_A_LIST_ERROR = "Expected a list of schedules"
+BULK_PAYLOAD_TOO_LARGE_ERROR = "Too many schedules in a single request"
+BULK_STATUS_NOT_ALLOWED_ERROR = "status must be one of {}"
+BULK_STATUS_SELECTION_ERROR = "Expected either a list of ids or a filter"
+BULK_STATUS_FILTER_ERROR = "filter must set one or more of {}"
+
+# Errors for pagination query parameters
+INVALID_CURSOR_ERROR = "Invalid cursor"
+INVALID_PAGE_SIZE_ERROR = "page_size must be a positive integer"
+
+# Errors for schedule list filters
+INVALID_FIELDS_ERROR = \
+    "fields must be a comma separated list of schedule fields"
+INVALID_STATUS_FILTER_ERROR = \
+    "status must be a comma separated list of statuses"
+INVALID_FREQUENCY_FILTER_ERROR = "frequency must be a duration"
+INVALID_DATE_FILTER_ERROR = "{} must be a date time"
+
 
 def frequency_not_greater_than_end_date(frequency, start_date, end_date):
     """
@@ -90,5 +109,38 @@ class RecipientDuplicateValidator:
                 raise ValidationError(RECIPIENTS_CONTAIN_DUPLICATES_ERROR)
 
 
+class UniqueScheduleValidator:
+    """
+    serializer validator for the uniqueness of schedules, checked with one
+    lookup on the unique fingerprint column. Fields missing from a partial
+    update take the values of the instance.
+    """
+    requires_context = True
+    fields = (
+        'description', 'subject', 'content', 'frequency', 'start_date',
+        'end_date'
+    )
+
+    def __init__(self, queryset, message=FIELDS_NOT_UNIQUE_TOGETHER_ERROR):
+        self.queryset = queryset
+        self.message = message
+
+    def __call__(self, attrs, serializer):
+        instance = serializer.instance
+        if instance is not None and not set(self.fields) & set(attrs):
+            return
+        queryset = self.queryset.filter(
+            fingerprint=schedule_data_fingerprint({
+                field: attrs[field] if field in attrs
+                else getattr(instance, field)
+                for field in self.fields
+            })
+        )
+        if instance is not None:
+            queryset = queryset.exclude(pk=instance.pk)
+        if queryset.exists():
+            raise ValidationError(self.message, code='unique')
+
+
 def is_valid_email_address(email_address):
     return search(r"[a-zA-Z0-9.]+@[a-zA-Z0-9.]+\.[a-zA-Z]+", email_address)